@@ -0,0 +1,125 @@
+# bench_styling.py - Per-reply cost of text styling and the phone details layout, before and after
+#
+# Run from the repository root:  python benchmarks/bench_styling.py > bench_output.txt
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from styling import MessageCatalog, PhoneDetailsTemplate, stylize  # noqa: E402
+
+WELCOME = (
+    "🎉 Welcome {name}!\n\n"
+    "🔍 I can help you find phone number details just like Truecaller!\n\n"
+    "📱 Just send me a phone number and I'll provide:\n"
+    "• Name (if available)\n"
+    "• Location\n"
+    "• Carrier\n"
+    "• Line Type\n"
+    "• Validation Status\n"
+    "• Timezone\n\n"
+    "📝 Format: 98xxxxxxxx or +919xxxxxxxx\n\n"
+    "💡 Example: 9876543210"
+)
+UNAUTHORIZED = "❌ ʏᴏᴜ ᴀʀᴇ ᴜɴᴀᴜᴛʜᴏʀɪᴢᴇᴅ"
+
+TRUECALLER = {"name": "Rahul Sharma"}
+VALIDATION = {
+    "valid": True,
+    "country_name": "India",
+    "location": "Maharashtra",
+    "carrier": "Reliance Jio Infocomm Ltd (RJIL)",
+    "line_type": "mobile",
+    "timezone": {"name": "Asia/Kolkata"}
+}
+
+
+def legacy_stylize(text: str) -> str:
+    """TruecallerBot.stylize_text before the translation table"""
+    normal = "abcdefghijklmnopqrstuvwxyz"
+    small_caps = "ᴀʙᴄᴅᴇꜰɢʜɪᴊᴋʟᴍɴᴏᴘǫʀꜱᴛᴜᴠᴡxʏᴢ"
+
+    result = ""
+    for char in text.lower():
+        if char in normal:
+            result += small_caps[normal.index(char)]
+        else:
+            result += char
+    return result
+
+
+def legacy_details(truecaller_data, validation_data, phone_number, pending=()):
+    """format_phone_details before the precompiled template"""
+    lines = []
+    lines.append("🌟 ᴘʜᴏɴᴇ ɴᴜᴍʙᴇʀ ᴅᴇᴛᴀɪʟs🌟\n")
+    lines.append("╔════❰ ɴᴜᴍʙᴇʀ ɪɴғᴏʀᴍᴀᴛɪᴏɴ ❱═❍")
+    lines.append(f"║┣⪼ <b>ɴᴜᴍʙᴇʀ:</b> +91{phone_number}")
+    if truecaller_data:
+        name = truecaller_data.get('name', 'ɴᴏᴛ ᴀᴠᴀɪʟᴀʙʟᴇ')
+        lines.append(f"║┣⪼ <b>ɴᴀᴍᴇ:</b> {name}")
+    elif "truecaller" in pending:
+        lines.append("║┣⪼ <b>ɴᴀᴍᴇ:</b> ⏳")
+    if validation_data:
+        country = validation_data.get('country_name', 'India')
+        location = validation_data.get('location', 'ɴᴏᴛ ᴀᴠᴀɪʟᴀʙʟᴇ')
+        carrier = validation_data.get('carrier', 'ɴᴏᴛ ᴀᴠᴀɪʟᴀʙʟᴇ')
+        line_type = validation_data.get('line_type', 'ɴᴏᴛ ᴀᴠᴀɪʟᴀʙʟᴇ')
+        valid = "✅ ᴠᴀʟɪᴅ" if validation_data.get('valid', False) else "❌ ɪɴᴠᴀʟɪᴅ"
+        lines.append(f"║┣⪼ <b>ᴄᴏᴜɴᴛʀʏ:</b> {country}")
+        lines.append(f"║┣⪼ <b>ʟᴏᴄᴀᴛɪᴏɴ:</b> {location}")
+        lines.append(f"║┣⪼ <b>ᴄᴀʀʀɪᴇʀ:</b> {carrier}")
+        lines.append(f"║┣⪼ <b>ʟɪɴᴇ ᴛʏᴘᴇ:</b> {line_type}")
+        lines.append(f"║┣⪼ <b>ᴠᴀʟɪᴅ:</b> {valid}")
+        timezone = validation_data.get('timezone', {})
+        if timezone:
+            tz_name = timezone.get('name', 'ɴᴏᴛ ᴀᴠᴀɪʟᴀʙʟᴇ')
+            lines.append(f"║┣⪼ <b>ᴛɪᴍᴇᴢᴏɴᴇ:</b> {tz_name}")
+    elif "validation" in pending:
+        lines.append("║┣⪼ ⏳ ꜰᴇᴛᴄʜɪɴɢ ᴍᴏʀᴇ ᴅᴇᴛᴀɪʟs...")
+    lines.append("║╰━━━━━━━━━━━━━━━➣")
+    lines.append("╚══════════════════❍")
+    lines.append("💬 ꜰᴏʀ ᴍᴏʀᴇ @INDIAN_HACKER_BOTS")
+    return "\n".join(lines)
+
+
+# How the welcome text is written in BotConfig.MESSAGES: styled, with its field left as is
+WELCOME_STYLED = legacy_stylize(WELCOME).replace(legacy_stylize("{name}"), "{name}")
+
+
+def bench(label: str, before, after, number: int = 20000) -> None:
+    before_us = min(timeit.repeat(before, number=number, repeat=5)) / number * 1e6
+    after_us = min(timeit.repeat(after, number=number, repeat=5)) / number * 1e6
+    print(f"{label:<28} before {before_us:8.2f} us   after {after_us:8.2f} us   {before_us / after_us:6.1f}x")
+
+
+def main() -> None:
+    catalog = MessageCatalog({"welcome": WELCOME_STYLED, "unauthorized": UNAUTHORIZED})
+    template = PhoneDetailsTemplate()
+
+    # Same output, only cheaper
+    assert catalog.render("welcome", name="Rahul") == legacy_stylize(WELCOME.format(name="Rahul"))
+    assert catalog["unauthorized"] == legacy_stylize(UNAUTHORIZED)
+    assert template.render(TRUECALLER, VALIDATION, "9876543210") == legacy_details(TRUECALLER, VALIDATION, "9876543210")
+
+    print(f"Python {sys.version.split()[0]}, per call (best of 5)\n")
+    bench("stylize welcome text",
+          lambda: legacy_stylize(WELCOME),
+          lambda: stylize(WELCOME))
+    bench("welcome reply (templated)",
+          lambda: legacy_stylize(WELCOME.format(name="Rahul")),
+          lambda: catalog.render("welcome", name="Rahul"))
+    bench("static reply",
+          lambda: legacy_stylize(UNAUTHORIZED),
+          lambda: catalog["unauthorized"])
+    bench("phone details",
+          lambda: legacy_details(TRUECALLER, VALIDATION, "9876543210"),
+          lambda: template.render(TRUECALLER, VALIDATION, "9876543210"))
+    bench("phone details (pending)",
+          lambda: legacy_details(TRUECALLER, {}, "9876543210", ("validation",)),
+          lambda: template.render(TRUECALLER, {}, "9876543210", ("validation",)))
+
+
+if __name__ == "__main__":
+    main()
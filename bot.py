@@ -1,44 +1,67 @@
 import asyncio
+import html
 import logging
 import re
 import json
-import requests
-from datetime import datetime
+import time
+from collections import Counter
 from typing import Dict, List, Optional
-import pandas as pd
-from io import BytesIO
 import os
 import warnings
 
+import httpx
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Bot
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler, ChatMemberHandler, ChatJoinRequestHandler
 from telegram.constants import ParseMode, ChatType
-from pymongo import MongoClient
 from bson import ObjectId
 from pyrogram import Client
 
 # Import configuration
-from config import BotConfig, APIKeysManager, TextStyler, PhoneUtils
+from config import BotConfig, APIKeysManager, PhoneUtils
+from styling import MessageCatalog, PhoneDetailsTemplate
+from http_client import PooledHTTPClient
+from cache import LookupCache, SingleFlight
+from storage import Database, parse_write_concern
+from stats import StatsAggregator, mask_key
+from keypool import KeyPool
+from breaker import CircuitBreaker, SourceUnavailable
+from latency import LatencyTracker, backoff_delay
+from tracing import annotate, current_trace, span, start_trace
+from metrics import (
+    REGISTRY, UPSTREAM_LATENCY, UPSTREAM_RESPONSES, InstrumentedRequest, MetricsServer,
+    MongoCommandListener, instrument_handler
+)
+from broadcast import BroadcastManager
+from logchannel import LogChannel
+from ratelimit import UserRateLimiter
+from export import EXPORT_USAGE, ExportJobRunner, parse_export_args
+from membership import MembershipCache, JoinRequestIndex, InviteLinkCache, match_force_sub_channel
+from logsetup import ThrottledLogger, Truncated, setup_logging
+
+# Suppress asyncio and pyrogram peer id errors (on the output handler, so
+# records from pyrogram's child loggers are covered as well)
+class IgnorePeerIdInvalid(logging.Filter):
+    def filter(self, record):
+        return "Peer id invalid" not in record.getMessage()
 
-# Configure logging
-logging.basicConfig(
-    format=BotConfig.LOG_FORMAT, 
-    level=logging.WARNING  # ya logging.ERROR
+# Configure logging (records are filtered and written by a background thread)
+setup_logging(
+    logging.getLevelName(BotConfig.LOG_LEVEL),
+    BotConfig.LOG_FORMAT,
+    json_lines=BotConfig.LOG_JSON,
+    filters=[IgnorePeerIdInvalid()]
 )
 logger = logging.getLogger(__name__)
+# Upstream response bodies: debug level only, at most one per provider every 10s
+upstream_log = ThrottledLogger(logger, interval=10)
 
 # Suppress httpx and telegram logs except WARNING and ERROR
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("telegram.ext").setLevel(logging.WARNING)
 logging.getLogger("telegram.bot").setLevel(logging.WARNING)
 
-# Suppress asyncio and pyrogram peer id errors
-class IgnorePeerIdInvalid(logging.Filter):
-    def filter(self, record):
-        return "Peer id invalid" not in record.getMessage()
-
-logging.getLogger("asyncio").addFilter(IgnorePeerIdInvalid())
-logging.getLogger("pyrogram").addFilter(IgnorePeerIdInvalid())
+# Sampled update timelines are logged at INFO
+logging.getLogger("tracing").setLevel(logging.INFO)
 
 # warnings.showwarning = ignore_peer_id_error
 
@@ -48,106 +71,120 @@ class TruecallerBot:
         if not BotConfig.validate_config():
             raise ValueError("Invalid configuration. Please check config.py")
         
-        self.mongo_client = MongoClient(BotConfig.MONGO_URI)
-        self.db = self.mongo_client['truecaller_bot']
-        self.users_collection = self.db[BotConfig.DB_COLLECTIONS['users']]
-        self.queries_collection = self.db[BotConfig.DB_COLLECTIONS['queries']]
-        self.stats_collection = self.db[BotConfig.DB_COLLECTIONS['stats']]
+        # Async MongoDB access layer (all handlers go through it)
+        self.db = Database(
+            BotConfig.MONGO_URI,
+            pool_size=BotConfig.MONGO_POOL_SIZE,
+            server_selection_timeout_ms=BotConfig.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            write_concern=parse_write_concern(BotConfig.MONGO_WRITE_CONCERN),
+            event_listeners=[MongoCommandListener()] if BotConfig.METRICS_ENABLED else None
+        )
+        
+        # Resumable broadcast jobs
+        self.broadcasts = BroadcastManager(
+            self.db,
+            rate=BotConfig.BROADCAST_RATE,
+            batch_size=BotConfig.BROADCAST_BATCH_SIZE,
+            progress_interval=BotConfig.BROADCAST_PROGRESS_INTERVAL
+        )
+        
+        # Data exports run one at a time in a worker process
+        self.exports = ExportJobRunner(progress_interval=BotConfig.EXPORT_PROGRESS_INTERVAL)
+        
+        # Per-user query limits
+        self.rate_limiter = UserRateLimiter(
+            per_minute=BotConfig.MAX_QUERIES_PER_MINUTE,
+            per_day=BotConfig.MAX_QUERIES_PER_USER_PER_DAY
+        )
+        
+        # Live counters for /stats, checkpointed to Mongo
+        self.stats = StatsAggregator()
+        
+        # Lookup result cache keyed on the normalized phone number
+        self.cache = LookupCache(
+            self.db.collection('cache'),
+            ttls={
+                "truecaller": BotConfig.CACHE_TTL_TRUECALLER,
+                "validation": BotConfig.CACHE_TTL_VALIDATION
+            },
+            stale_ttl=BotConfig.CACHE_STALE_TTL,
+            max_entries=BotConfig.CACHE_MAX_ENTRIES
+        )
+        # Concurrent lookups of the same number share one upstream call per provider
+        self.inflight = SingleFlight()
+        # User-facing texts, styled once here instead of on every reply
+        self.messages = MessageCatalog(BotConfig.MESSAGES)
+        self.details_template = PhoneDetailsTemplate()
+        # Log channel events are batched and sent in the background
+        self.log_channel = LogChannel(
+            BotConfig.LOG_CHANNEL_ID,
+            batch_size=BotConfig.LOG_CHANNEL_BATCH_SIZE,
+            flush_interval=BotConfig.LOG_CHANNEL_FLUSH_INTERVAL,
+            max_pending=BotConfig.LOG_CHANNEL_MAX_PENDING
+        )
+        # One circuit breaker per upstream, so a dead provider fails fast
+        self.breakers = {
+            provider: CircuitBreaker(
+                provider,
+                window=BotConfig.BREAKER_WINDOW,
+                min_calls=BotConfig.BREAKER_MIN_CALLS,
+                error_rate=BotConfig.BREAKER_ERROR_RATE,
+                slow_call_seconds=BotConfig.BREAKER_SLOW_CALL_SECONDS,
+                open_seconds=BotConfig.BREAKER_OPEN_SECONDS
+            )
+            for provider in ("truecaller", "validation")
+        }
+        # Rolling latency per upstream, drives timeouts and hedging
+        self.latency = {
+            provider: LatencyTracker(BotConfig.LATENCY_WINDOW)
+            for provider in ("truecaller", "validation")
+        }
+        
+        # Membership status per (user, channel), kept fresh by chat member updates
+        self.membership = MembershipCache(BotConfig.MEMBERSHIP_CACHE_TTL)
+        # Pending join requests per channel, resynced from the userbot periodically
+        self.join_requests = JoinRequestIndex()
+        # Invite links and the join keyboard, resolved at startup
+        self.invite_links = InviteLinkCache(BotConfig.FORCE_SUB_CHANNELS)
         
         # Initialize API keys manager
         self.api_keys = APIKeysManager(BotConfig.ACCESS_KEYS_FILE)
-        self.access_keys = self.api_keys.keys  # <-- Add this line
-        self.current_key_index = 0
+        # Single pool that tracks each key's health and remaining quota
+        self.key_pool = KeyPool(self.api_keys.keys, BotConfig.API_KEY_MONTHLY_QUOTA)
         
-        # Initialize stats
-        self.init_stats()
-    
-    def init_stats(self):
-        """Initialize statistics collection"""
-        if not self.stats_collection.find_one({"type": "daily"}):
-            self.stats_collection.insert_one({
-                "type": "daily",
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "queries": 0,
-                "users": 0
-            })
-    
-    async def check_subscription(self, user_id: int, bot: Bot) -> bool:
-        """Check if user is subscribed to force sub channels or has pending join request"""
-        for channel in BotConfig.FORCE_SUB_CHANNELS:
-            try:
-                member = await bot.get_chat_member(channel["id"], user_id)
-                if member.status in ['left', 'kicked']:
-                    # Check pending join request via userbot
-                    if await has_pending_join_request(user_id, channel["id"]):
-                        continue  # allow if join request pending
-                    return False
-            except Exception:
-                # Check pending join request via userbot
-                if await has_pending_join_request(user_id, channel["id"]):
-                    continue
-                return False
-        return True
-
-    async def get_subscription_keyboard(self, bot):
-        keyboard = []
-        for channel in BotConfig.FORCE_SUB_CHANNELS:
-            url = await get_channel_invite_link(bot, channel["id"])
-            if url:
-                keyboard.append([InlineKeyboardButton(
-                    f"📢 ᴊᴏɪɴ {channel['name']}",
-                    url=url
-                )])
-        keyboard.append([InlineKeyboardButton(
-            "✅ ᴄʜᴇᴄᴋ ᴍᴇᴍʙᴇʀsʜɪᴘ",
-            callback_data="check_membership"
-        )])
-        return InlineKeyboardMarkup(keyboard),
-    
-    def stylize_text(self, text: str) -> str:
-        """Convert text to stylized small caps Unicode"""
-        normal = "abcdefghijklmnopqrstuvwxyz"
-        small_caps = "ᴀʙᴄᴅᴇꜰɢʜɪᴊᴋʟᴍɴᴏᴘǫʀꜱᴛᴜᴠᴡxʏᴢ"
-        
-        result = ""
-        for char in text.lower():
-            if char in normal:
-                result += small_caps[normal.index(char)]
-            else:
-                result += char
-        return result
+        # Shared HTTP client for upstream lookups (started in on_startup)
+        self.http = PooledHTTPClient(
+            max_connections=BotConfig.HTTP_MAX_CONNECTIONS,
+            max_keepalive=BotConfig.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=BotConfig.HTTP_KEEPALIVE_EXPIRY,
+            per_host_limit=BotConfig.HTTP_MAX_CONNECTIONS_PER_HOST,
+            timeout=BotConfig.HTTP_TIMEOUT
+        )
     
-    async def check_subscription(self, user_id: int, bot: Bot) -> bool:
+    async def check_subscription(self, user_id: int, bot: Bot, force_refresh: bool = False) -> bool:
         """Check if user is subscribed to force sub channels or has pending join request"""
         for channel in BotConfig.FORCE_SUB_CHANNELS:
-            try:
-                member = await bot.get_chat_member(channel["id"], user_id)
-                if member.status in ['left', 'kicked']:
-                    # Check pending join request via userbot
-                    if await has_pending_join_request(user_id, channel["id"]):
-                        continue  # allow if join request pending
-                    return False
-            except Exception:
+            is_member = None if force_refresh else self.membership.get(user_id, channel["id"])
+            if is_member is None:
+                try:
+                    with span("get_chat_member", channel=str(channel["id"])):
+                        member = await bot.get_chat_member(channel["id"], user_id)
+                    is_member = member.status not in ['left', 'kicked']
+                    self.membership.set(user_id, channel["id"], is_member)
+                except Exception:
+                    is_member = False
+            if not is_member:
                 # Check pending join request via userbot
-                if await has_pending_join_request(user_id, channel["id"]):
-                    continue
+                with span("has_pending_join_request"):
+                    has_request = has_pending_join_request(user_id, channel["id"])
+                if has_request:
+                    continue  # allow if join request pending
                 return False
         return True
     
-    async def get_subscription_keyboard(self, bot):
-        keyboard = []
-        for channel in BotConfig.FORCE_SUB_CHANNELS:
-            url = await get_channel_invite_link(bot, channel["id"])
-            if url:
-                keyboard.append([InlineKeyboardButton(
-                    f"📢 ᴊᴏɪɴ {channel['name']}",
-                    url=url
-                )])
-        keyboard.append([InlineKeyboardButton(
-            "✅ ᴄʜᴇᴄᴋ ᴍᴇᴍʙᴇʀsʜɪᴘ",
-            callback_data="check_membership"
-        )])
-        return InlineKeyboardMarkup(keyboard)
+    def get_subscription_keyboard(self) -> InlineKeyboardMarkup:
+        """Prebuilt join keyboard (refreshed in the background, no API calls)"""
+        return self.invite_links.keyboard
     
     def validate_phone_number(self, number: str) -> tuple:
         """Validate Indian phone number format"""
@@ -172,38 +209,114 @@ class TruecallerBot:
         
         return True, phone_number
     
-    def get_current_access_key(self) -> str:
-        """Get current access key and rotate if needed"""
-        if not self.access_keys:
-            return None
+    async def lookup(self, provider: str, phone_number: str) -> Dict:
+        """Cached lookup; stale entries are served at once and refreshed in the background.
 
-        key = self.access_keys[self.current_key_index]
-        # Only rotate if more than one key
-        if len(self.access_keys) > 1:
-            self.current_key_index = (self.current_key_index + 1) % len(self.access_keys)
-        return key
+        Raises SourceUnavailable when the provider's circuit is open and
+        nothing is cached, not even an expired entry.
+        """
+        circuit_open = self.breakers[provider].is_open()
+        data, is_stale = await self.cache.get(provider, phone_number)
+        if data is not None:
+            if is_stale and not circuit_open:
+                spawn_background(self.refresh_lookup(provider, phone_number))
+            return data
+        if circuit_open:
+            data = self.cache.peek(provider, phone_number)
+            if data is None:
+                raise SourceUnavailable(provider)
+            return data
+        return await self.refresh_lookup(provider, phone_number)
+    
+    async def refresh_lookup(self, provider: str, phone_number: str) -> Dict:
+        """Fetch from the upstream provider, coalescing identical concurrent requests"""
+        return await self.inflight.do(
+            (provider, phone_number),
+            lambda: self.fetch_and_cache(provider, phone_number)
+        )
+    
+    async def fetch_and_cache(self, provider: str, phone_number: str) -> Dict:
+        """Fetch from the upstream provider and cache non-empty results"""
+        if provider == "truecaller":
+            data = await self.fetch_truecaller_data(phone_number)
+        else:
+            data = await self.fetch_validation_data(phone_number)
+        if data:
+            self.cache.set(provider, phone_number, data)
+        return data
+    
+    async def upstream_get(self, provider: str, url: str, params: Optional[Dict] = None, hedge: bool = False):
+        """GET through the provider's circuit breaker with an adaptive timeout.
+
+        5xx responses and connection errors are retried with jittered
+        exponential backoff; they, and slow calls, count as breaker failures.
+        With `hedge`, a second request is sent once the first runs past p95.
+        """
+        breaker = self.breakers[provider]
+        latency = self.latency[provider]
+        for attempt in range(BotConfig.UPSTREAM_RETRIES + 1):
+            if not breaker.allow():
+                raise SourceUnavailable(provider)
+            timeout = latency.timeout(
+                BotConfig.HTTP_TIMEOUT, BotConfig.UPSTREAM_TIMEOUT_MIN, BotConfig.UPSTREAM_TIMEOUT_MULTIPLIER
+            )
+            hedge_after = latency.percentile(95) if hedge and BotConfig.HEDGE_REQUESTS else None
+            started = time.monotonic()
+            try:
+                with span(f"http.{provider}", attempt=attempt, timeout=round(timeout, 2)):
+                    response = await self.http.get(url, params=params, timeout=timeout, hedge_after=hedge_after)
+            except httpx.TransportError as e:
+                breaker.record(False, time.monotonic() - started)
+                UPSTREAM_RESPONSES.inc(provider, "error")
+                if attempt == BotConfig.UPSTREAM_RETRIES:
+                    raise
+                logger.warning(f"{provider} request failed ({type(e).__name__}), retrying")
+            except BaseException:
+                # Cancellation too, or a half-open probe would never report back
+                breaker.record(False, time.monotonic() - started)
+                raise
+            else:
+                elapsed = time.monotonic() - started
+                breaker.record(response.status_code < 500, elapsed)
+                UPSTREAM_LATENCY.observe(elapsed, provider)
+                UPSTREAM_RESPONSES.inc(provider, str(response.status_code))
+                if response.status_code < 500:
+                    latency.record(elapsed)
+                    return response
+                if attempt == BotConfig.UPSTREAM_RETRIES:
+                    return response
+                logger.warning(f"{provider} returned {response.status_code}, retrying")
+            await asyncio.sleep(backoff_delay(attempt, BotConfig.UPSTREAM_BACKOFF_BASE, BotConfig.UPSTREAM_BACKOFF_CAP))
     
     async def fetch_truecaller_data(self, phone_number: str) -> Dict:
         """Fetch data from Truecaller API"""
         try:
             url = f"https://true-call-check.vercel.app/api/truecaller?q=+91{phone_number}"
-            response = requests.get(url, timeout=10)
-            logger.info(f"Truecaller API response: {response.text}")  # <-- Add this line
+            response = await self.upstream_get("truecaller", url, hedge=True)
+            upstream_log.debug(
+                "truecaller", "Truecaller API response %s: %s",
+                response.status_code, Truncated(lambda: response.text, BotConfig.LOG_MAX_PAYLOAD)
+            )
             if response.status_code == 200:
                 return response.json()
+            self.stats.record_error("truecaller")
+        except SourceUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Truecaller API error: {e}")
+            self.stats.record_error("truecaller")
         return {}
     
-    async def fetch_validation_data(self, phone_number: str, context=None) -> Dict:
-        """Fetch data from validation API with access key rotation"""
-        max_attempts = len(self.access_keys)
+    async def fetch_validation_data(self, phone_number: str) -> Dict:
+        """Fetch data from validation API using the healthiest key in the pool"""
+        tried = set()
         key_failed = False
 
-        for attempt in range(max_attempts):
-            access_key = self.get_current_access_key()
+        while True:
+            access_key = self.key_pool.acquire(exclude=tried)
             if not access_key:
                 break
+            tried.add(access_key)
 
             try:
                 url = f"http://apilayer.net/api/validate"
@@ -214,64 +327,51 @@ class TruecallerBot:
                     'format': '1'
                 }
 
-                response = requests.get(url, params=params, timeout=10)
-                logger.info(f"Validation API response: {response.text}")
-                if response.status_code == 200:
-                    data = response.json()
-                    if "success" in data and not data["success"]:
-                        error_info = data.get('error', {}).get('info', '')
-                        # Sirf jab limit exceed ho tab log channel me bhejein
-                        if "Your monthly API request volume has been reached" in error_info or "limit" in error_info.lower():
-                            key_failed = True
-                            if context:
-                                await context.bot.send_message(
-                                    chat_id=BotConfig.LOG_CHANNEL_ID,
-                                    text=f"❌ API key limit exceeded: `{access_key}`",
-                                    parse_mode=ParseMode.MARKDOWN
-                                )
-                        logger.error(f"Validation API error: {error_info}")
-                        continue  # Try next key
-                    return data
+                self.stats.record_key_use(access_key)
+                response = await self.upstream_get("validation", url, params=params)
+                upstream_log.debug(
+                    "validation", "Validation API response %s: %s",
+                    response.status_code, Truncated(lambda: response.text, BotConfig.LOG_MAX_PAYLOAD)
+                )
+                if response.status_code != 200:
+                    self.stats.record_error("validation")
+                    continue
+                self.key_pool.record_use(access_key)
+                data = response.json()
+                if "success" in data and not data["success"]:
+                    error = data.get('error', {})
+                    error_info = error.get('info', '')
+                    # 104: monthly usage limit reached, 101/102: invalid or inactive key
+                    if error.get('code') == 104 or "limit" in error_info.lower():
+                        key_failed = True
+                        self.key_pool.mark_exhausted(access_key)
+                        self.log_channel.post(
+                            f"❌ API key limit exceeded: <code>{html.escape(access_key)}</code>",
+                            key=("key_exhausted", access_key)
+                        )
+                    elif error.get('code') in (101, 102):
+                        self.key_pool.mark_invalid(access_key)
+                    logger.error(f"Validation API error: {error_info}")
+                    self.stats.record_error("validation")
+                    continue  # Try next key
+                return data
+            except SourceUnavailable:
+                raise
             except Exception as e:
-                logger.error(f"Validation API error with key {access_key}: {e}")
+                logger.error(f"Validation API error with key {mask_key(access_key)}: {e}")
+                self.stats.record_error("validation")
                 continue
 
-        # If all keys failed
-        if key_failed and context:
-            await context.bot.send_message(
-                chat_id=BotConfig.LOG_CHANNEL_ID,
-                text="❌ All API keys exhausted! Please add new keys.",
-                parse_mode=ParseMode.MARKDOWN
-            )
+        # If the last healthy key just ran out
+        if key_failed and not self.key_pool.healthy_count():
+            self.log_channel.post("❌ All API keys exhausted! Please add new keys.", key="keys_exhausted")
         return {}
     
-    def format_phone_details(self, truecaller_data: Dict, validation_data: Dict, phone_number: str) -> str:
-        lines = []
-        lines.append("🌟 ᴘʜᴏɴᴇ ɴᴜᴍʙᴇʀ ᴅᴇᴛᴀɪʟs🌟\n")
-        lines.append("╔════❰ ɴᴜᴍʙᴇʀ ɪɴғᴏʀᴍᴀᴛɪᴏɴ ❱═❍")
-        lines.append(f"║┣⪼ <b>ɴᴜᴍʙᴇʀ:</b> +91{phone_number}")
-        if truecaller_data:
-            name = truecaller_data.get('name', 'ɴᴏᴛ ᴀᴠᴀɪʟᴀʙʟᴇ')
-            lines.append(f"║┣⪼ <b>ɴᴀᴍᴇ:</b> {name}")
-        if validation_data:
-            country = validation_data.get('country_name', 'India')
-            location = validation_data.get('location', 'ɴᴏᴛ ᴀᴠᴀɪʟᴀʙʟᴇ')
-            carrier = validation_data.get('carrier', 'ɴᴏᴛ ᴀᴠᴀɪʟᴀʙʟᴇ')
-            line_type = validation_data.get('line_type', 'ɴᴏᴛ ᴀᴠᴀɪʟᴀʙʟᴇ')
-            valid = "✅ ᴠᴀʟɪᴅ" if validation_data.get('valid', False) else "❌ ɪɴᴠᴀʟɪᴅ"
-            lines.append(f"║┣⪼ <b>ᴄᴏᴜɴᴛʀʏ:</b> {country}")
-            lines.append(f"║┣⪼ <b>ʟᴏᴄᴀᴛɪᴏɴ:</b> {location}")
-            lines.append(f"║┣⪼ <b>ᴄᴀʀʀɪᴇʀ:</b> {carrier}")
-            lines.append(f"║┣⪼ <b>ʟɪɴᴇ ᴛʏᴘᴇ:</b> {line_type}")
-            lines.append(f"║┣⪼ <b>ᴠᴀʟɪᴅ:</b> {valid}")
-            timezone = validation_data.get('timezone', {})
-            if timezone:
-                tz_name = timezone.get('name', 'ɴᴏᴛ ᴀᴠᴀɪʟᴀʙʟᴇ')
-                lines.append(f"║┣⪼ <b>ᴛɪᴍᴇᴢᴏɴᴇ:</b> {tz_name}")
-        lines.append("║╰━━━━━━━━━━━━━━━➣")
-        lines.append("╚══════════════════❍")
-        lines.append("💬 ꜰᴏʀ ᴍᴏʀᴇ @INDIAN_HACKER_BOTS")
-        return "\n".join(lines)
+    def format_phone_details(self, truecaller_data: Dict, validation_data: Dict, phone_number: str,
+                             pending: tuple = (), unavailable: tuple = ()) -> str:
+        """Render lookup results; sources in `pending` are shown as still loading,
+        sources in `unavailable` as down"""
+        return self.details_template.render(truecaller_data, validation_data, phone_number, pending, unavailable)
     
     def get_contact_buttons(self, phone_number: str):
         """Get WhatsApp and Telegram contact buttons"""
@@ -282,49 +382,6 @@ class TruecallerBot:
             ]
         ]
         return InlineKeyboardMarkup(keyboard)
-    
-    def save_user(self, user_id: int, username: str = None, name: str = None):
-        """Save user to database and return True if new user"""
-        user_data = {
-            "user_id": user_id,
-            "username": username,
-            "name": name,
-            "first_seen": datetime.now()
-        }
-        result = self.users_collection.update_one(
-            {"user_id": user_id},
-            {
-                "$setOnInsert": user_data,
-                "$set": {"last_seen": datetime.now()}
-            },
-            upsert=True
-        )
-        return result.upserted_id is not None
-    
-    def save_query(self, user_id: int, phone_number: str, result: Dict):
-        """Save query to database"""
-        query_data = {
-            "user_id": user_id,
-            "phone_number": phone_number,
-            "result": result,
-            "timestamp": datetime.now()
-        }
-        
-        self.queries_collection.insert_one(query_data)
-        
-        # Update user query count
-        self.users_collection.update_one(
-            {"user_id": user_id},
-            {"$inc": {"query_count": 1}}
-        )
-        
-        # Update daily stats
-        today = datetime.now().strftime("%Y-%m-%d")
-        self.stats_collection.update_one(
-            {"type": "daily", "date": today},
-            {"$inc": {"queries": 1}},
-            upsert=True
-        )
 
 # Initialize bot
 bot_instance = TruecallerBot()
@@ -337,10 +394,12 @@ userbot = Client(
     session_string=BotConfig.PYROGRAM_STRING_SESSION
 )
 
+@instrument_handler
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start command handler"""
     user = update.effective_user
-    is_new = bot_instance.save_user(user.id, user.username, user.first_name)
+    is_new = await bot_instance.db.save_user(user.id, user.username, user.first_name)
+    bot_instance.stats.record_user(is_new)
 
     # 1. Sabse pehle sticker bhejo aur uska message object save karo
     sticker_msg = None
@@ -351,28 +410,16 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # --- Log to channel only for new users ---
     if is_new:
-        log_text = (
+        bot_instance.log_channel.post(
             f"👤 New User Started Bot\n"
             f"ID: <code>{user.id}</code>\n"
-            f"Username: @{user.username}\n"
-            f"Name: {user.first_name}"
+            f"Username: @{html.escape(str(user.username))}\n"
+            f"Name: {html.escape(user.first_name or '')}"
         )
-        try:
-            await context.bot.send_message(
-                chat_id=BotConfig.LOG_CHANNEL_ID,
-                text=log_text,
-                parse_mode=ParseMode.HTML
-            )
-        except Exception as e:
-            logger.error(f"Log channel error: {e}")
 
     # Check subscription
     if not await bot_instance.check_subscription(user.id, context.bot):
-        welcome_text = bot_instance.stylize_text(
-            f"🎉 Welcome {user.first_name}!\n\n"
-            "🔍 I can help you find phone number details just like Truecaller!\n\n"
-            "⚠️ To use this bot, you must join our channels first:"
-        )
+        welcome_text = bot_instance.messages.render("welcome_force_sub", name=user.first_name)
         # Sticker delete karo (agar bheja gaya tha)
         if sticker_msg:
             try:
@@ -383,23 +430,11 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_photo(
             photo=BotConfig.WELCOME_IMAGE,
             caption=welcome_text,
-            reply_markup=await bot_instance.get_subscription_keyboard(context.bot)
+            reply_markup=bot_instance.get_subscription_keyboard()
         )
         return
 
-    welcome_text = bot_instance.stylize_text(
-        f"🎉 Welcome {user.first_name}!\n\n"
-        "🔍 I can help you find phone number details just like Truecaller!\n\n"
-        "📱 Just send me a phone number and I'll provide:\n"
-        "• Name (if available)\n"
-        "• Location\n"
-        "• Carrier\n"
-        "• Line Type\n"
-        "• Validation Status\n"
-        "• Timezone\n\n"
-        "📝 Format: 98xxxxxxxx or +919xxxxxxxx\n\n"
-        "💡 Example: 9876543210"
-    )
+    welcome_text = bot_instance.messages.render("welcome", name=user.first_name)
 
     # Sticker delete karo (agar bheja gaya tha)
     if sticker_msg:
@@ -413,114 +448,211 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         caption=welcome_text
     )
 
+@instrument_handler
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle phone number messages"""
-    user = update.effective_user
-
+    """Handle phone number messages (a sample of them is traced)"""
     # Ignore non-text messages
     if not update.message or not update.message.text:
         return
+    
+    trace = start_trace("handle_message", BotConfig.TRACE_SAMPLE_RATE, user_id=update.effective_user.id)
+    try:
+        await process_message(update, context)
+    finally:
+        if trace is not None and not trace.deferred:
+            trace.finish()
+
+async def process_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Rate limit, subscription and number checks, then the lookup itself"""
+    user = update.effective_user
 
     message_text = update.message.text
     
+    # Flood limit (and users already at their daily limit) before any other work
+    if user.id != BotConfig.OWNER_ID:
+        with span("rate_limit"):
+            allowed, limit_hit, retry_after = bot_instance.rate_limiter.check(user.id)
+        if not allowed:
+            annotate(outcome=f"rate_limited_{limit_hit}")
+            if limit_hit == "day":
+                text = bot_instance.messages.render("daily_limit", limit=BotConfig.MAX_QUERIES_PER_USER_PER_DAY)
+            else:
+                text = bot_instance.messages.render("minute_limit", seconds=int(retry_after) + 1)
+            await update.message.reply_text(text)
+            return
+    
     # Check subscription first
-    if not await bot_instance.check_subscription(user.id, context.bot):
+    with span("check_subscription"):
+        subscribed = await bot_instance.check_subscription(user.id, context.bot)
+    if not subscribed:
+        annotate(outcome="not_subscribed")
         await update.message.reply_photo(
             photo=BotConfig.WELCOME_IMAGE,
-            caption=bot_instance.stylize_text(
-                "⚠️ ᴘʟᴇᴀsᴇ ᴊᴏɪɴ ᴏᴜʀ ᴄʜᴀɴɴᴇʟs ꜰɪʀsᴛ ᴛᴏ ᴜsᴇ ᴛʜᴇ ʙᴏᴛ:"
-            ),
-            reply_markup=await bot_instance.get_subscription_keyboard(context.bot)
+            caption=bot_instance.messages["force_sub"],
+            reply_markup=bot_instance.get_subscription_keyboard()
         )
         return
     
     # Check if message contains phone number
     if not re.search(r'[\d+]', message_text):
+        annotate(outcome="not_a_number")
         await update.message.reply_text(
-            bot_instance.stylize_text(
-                "📱 ᴘʟᴇᴀsᴇ sᴇɴᴅ ᴀ ᴠᴀʟɪᴅ ᴘʜᴏɴᴇ ɴᴜᴍʙᴇʀ\n\n"
-                "📝 ꜰᴏʀᴍᴀᴛ: 98xxxxxxxx\n"
-                "💡 ᴇxᴀᴍᴘʟᴇ: `9876543210`"
-            ),
+            bot_instance.messages["invalid_format"],
             parse_mode=ParseMode.MARKDOWN
         )
         return
     
     # Validate phone number
-    is_valid, result = bot_instance.validate_phone_number(message_text)
+    with span("validate_phone_number"):
+        is_valid, result = bot_instance.validate_phone_number(message_text)
     if not is_valid:
+        annotate(outcome="invalid_number")
         await update.message.reply_text(
-            bot_instance.stylize_text(
-                f"❌ ɪɴᴠᴀʟɪᴅ ɴᴜᴍʙᴇʀ ꜰᴏʀᴍᴀᴛ\n\n"
-                f"🔍 ᴇʀʀᴏʀ: {result}\n\n"
-                f"📝 ᴄᴏʀʀᴇᴄᴛ ꜰᴏʀᴍᴀᴛ:\n"
-                f"• 9876543210\n"
-                f"• +919876543210\n\n"
-                f"📱 ᴘʟᴇᴀsᴇ sᴇɴᴅ ᴀ ᴠᴀʟɪᴅ ɪɴᴅɪᴀɴ ᴘʜᴏɴᴇ ɴᴜᴍʙᴇʀ"
-            )
+            bot_instance.messages.render("invalid_number", error=result)
         )
         return
     
     phone_number = result
 
+    # Only messages that are actual lookups count against the daily limit
+    if user.id != BotConfig.OWNER_ID and not bot_instance.rate_limiter.count_query(user.id):
+        annotate(outcome="rate_limited_day")
+        await update.message.reply_text(
+            bot_instance.messages.render("daily_limit", limit=BotConfig.MAX_QUERIES_PER_USER_PER_DAY)
+        )
+        return
+
     # --- Log to channel ---
-    log_text = (
+    # Repeated lookups of the same number by the same user are merged
+    bot_instance.log_channel.post(
         f"🔎 User Query\n"
-        f"User: <code>{user.id}</code> @{user.username}\n"
-        f"Number: <code>+91{phone_number}</code>"
+        f"User: <code>{user.id}</code> @{html.escape(str(user.username))}\n"
+        f"Number: <code>+91{phone_number}</code>",
+        key=("query", user.id, phone_number)
     )
-    try:
-        await context.bot.send_message(
-            chat_id=BotConfig.LOG_CHANNEL_ID,
-            text=log_text,
-            parse_mode=ParseMode.HTML
-        )
-    except Exception as e:
-        logger.error(f"Log channel error: {e}")
 
     # Send processing message
-    processing_msg = await update.message.reply_text(
-        bot_instance.stylize_text("🔍 ꜰᴇᴛᴄʜɪɴɡ ᴅᴇᴛᴀɪʟs... ⏳")
-    )
+    with span("processing_reply"):
+        processing_msg = await update.message.reply_text(
+            bot_instance.messages["processing"]
+        )
     
     try:
-        # Fetch data from both APIs
-        truecaller_data = await bot_instance.fetch_truecaller_data(phone_number)
-        validation_data = await bot_instance.fetch_validation_data(phone_number, context)
-        
-        if not validation_data:
-            await processing_msg.edit_text(
-                bot_instance.stylize_text(
-                    "❌ ᴀʟʟ ᴀᴘɪ ᴋᴇʏs ᴇxʜᴀᴜsᴛᴇᴅ ᴏʀ ʟɪᴍɪᴛ ᴇxᴄᴇᴇᴅᴇᴅ.\n\n"
-                    "🔑 ᴘʟᴇᴀsᴇ ᴀᴅᴅ ɴᴇᴡ ᴋᴇʏs ᴏʀ ᴄᴏɴᴛᴀᴄᴛ ᴏᴡɴᴇʀ."
-                )
+        # Fetch data from both APIs in parallel under one latency budget
+        lookups = {
+            "truecaller": asyncio.create_task(
+                traced_lookup("truecaller", bot_instance.lookup("truecaller", phone_number))
+            ),
+            "validation": asyncio.create_task(
+                traced_lookup("validation", bot_instance.lookup("validation", phone_number))
             )
-            return
-        
-        # Format and send details
-        details_text = bot_instance.format_phone_details(truecaller_data, validation_data, phone_number)
+        }
+        with span("wait_deadline"):
+            done, pending = await asyncio.wait(lookups.values(), timeout=BotConfig.LOOKUP_DEADLINE)
+            if not done:
+                # Nothing to show yet, wait for whichever source answers first
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
         
-        await processing_msg.edit_text(
-            details_text,
-            parse_mode=ParseMode.HTML,
-            reply_markup=bot_instance.get_contact_buttons(phone_number)
-        )
+        await render_lookup(processing_msg, phone_number, lookups)
+        annotate(outcome="partial" if pending else "complete")
         
-        # Save query to database
-        bot_instance.save_query(user.id, phone_number, {
-            "truecaller": truecaller_data,
-            "validation": validation_data
-        })
+        if pending:
+            # Edit the reply again when the slower source finishes; it also ends the trace
+            trace = current_trace()
+            if trace is not None:
+                trace.defer()
+            spawn_background(finish_lookup(processing_msg, user.id, phone_number, lookups))
+        else:
+            await save_lookup(user.id, phone_number, lookups)
         
     except Exception as e:
         logger.error(f"Error processing phone number: {e}")
+        annotate(outcome="error")
         await processing_msg.edit_text(
-            bot_instance.stylize_text(
-                "❌ ᴇʀʀᴏʀ ꜰᴇᴛᴄʜɪɴɡ ᴅᴇᴛᴀɪʟs\n\n"
-                "🔄 ᴘʟᴇᴀsᴇ ᴛʀʏ ᴀɢᴀɪɴ ʟᴀᴛᴇʀ"
-            )
+            bot_instance.messages["error"]
         )
 
+async def traced_lookup(provider: str, lookup) -> Dict:
+    with span(f"lookup.{provider}"):
+        return await lookup
+
+def lookup_result(task: asyncio.Task) -> Dict:
+    """Result of a finished lookup task, or {} if it is pending, cancelled or failed"""
+    if not task.done() or task.cancelled():
+        return {}
+    if isinstance(task.exception(), SourceUnavailable):
+        return {}
+    if task.exception():
+        logger.error(f"Lookup error: {task.exception()}")
+        return {}
+    return task.result()
+
+async def render_lookup(processing_msg, phone_number: str, lookups: Dict[str, asyncio.Task]):
+    """Edit the processing message with whatever lookup results have arrived"""
+    truecaller_data = lookup_result(lookups["truecaller"])
+    validation_data = lookup_result(lookups["validation"])
+    pending = tuple(source for source, task in lookups.items() if not task.done())
+    unavailable = tuple(
+        source for source, task in lookups.items()
+        if task.done() and not task.cancelled() and isinstance(task.exception(), SourceUnavailable)
+    )
+    
+    if not pending and not unavailable and not truecaller_data and not validation_data:
+        await processing_msg.edit_text(
+            bot_instance.messages["keys_exhausted"]
+        )
+        return
+    
+    # Format and send details
+    details_text = bot_instance.format_phone_details(
+        truecaller_data, validation_data, phone_number, pending, unavailable
+    )
+    try:
+        with span("edit_text", pending=len(pending)):
+            await processing_msg.edit_text(
+                details_text,
+                parse_mode=ParseMode.HTML,
+                reply_markup=bot_instance.get_contact_buttons(phone_number)
+            )
+    except Exception as e:
+        if "Message is not modified" not in str(e):
+            raise
+
+async def save_lookup(user_id: int, phone_number: str, lookups: Dict[str, asyncio.Task]):
+    """Save query to database if any source returned data"""
+    result = {source: lookup_result(task) for source, task in lookups.items()}
+    if any(result.values()):
+        bot_instance.stats.record_query()
+        with span("save_query"):
+            await bot_instance.db.save_query(user_id, phone_number, result)
+
+async def finish_lookup(processing_msg, user_id: int, phone_number: str, lookups: Dict[str, asyncio.Task]):
+    """Wait for the slower sources, then re-render and save the query"""
+    with span("wait_followup"):
+        _, pending = await asyncio.wait(lookups.values(), timeout=BotConfig.LOOKUP_FOLLOWUP_TIMEOUT)
+    for task in pending:
+        task.cancel()
+    try:
+        await render_lookup(processing_msg, phone_number, lookups)
+        await save_lookup(user_id, phone_number, lookups)
+    except Exception as e:
+        logger.error(f"Error finishing lookup for {phone_number}: {e}")
+    finally:
+        trace = current_trace()
+        if trace is not None:
+            trace.finish()
+
+# Strong references to fire-and-forget tasks so they are not garbage collected
+background_tasks = set()
+
+def spawn_background(coro) -> asyncio.Task:
+    """Run a coroutine in the background without awaiting it"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+@instrument_handler
 async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle callback queries"""
     query = update.callback_query
@@ -528,14 +660,9 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if query.data == "check_membership":
         user_id = query.from_user.id
-        if await bot_instance.check_subscription(user_id, context.bot):
+        if await bot_instance.check_subscription(user_id, context.bot, force_refresh=True):
             # Only edit if not already success message
-            success_caption = bot_instance.stylize_text(
-                "✅ ᴛʜᴀɪᴋ ʏᴏᴜ ꜰᴏʀ ᴊᴏɪɴɪɴɢ!\n\n"
-                "🔍 ɴᴏᴡ ʏᴏᴜ ᴄᴀɴ ᴜsᴇ ᴛʜᴇ ʙᴏᴛ\n"
-                "📱 ᴊᴜsᴛ sᴇɴᴅ ᴍᴇ ᴀ ᴘʜᴏɴᴇ ɴᴜᴍʙᴇʀ!\n\n"
-                "💡 ᴇxᴀᴍᴘʟᴇ: 9876543210"
-            )
+            success_caption = bot_instance.messages["membership_verified"]
             if query.message.caption != success_caption:
                 try:
                     await query.edit_message_caption(
@@ -548,42 +675,111 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Always update if not subscribed (keyboard may change)
             try:
                 await query.edit_message_caption(
-                    caption=bot_instance.stylize_text(
-                        "❌ ᴘʟᴇᴀsᴇ ᴊᴏɪɴ ᴀʟʟ ᴄʜᴀɴɴᴇʟs ꜰɪʀsᴛ"
-                    ),
-                    reply_markup=await bot_instance.get_subscription_keyboard(context.bot)
+                    caption=bot_instance.messages["join_channels"],
+                    reply_markup=bot_instance.get_subscription_keyboard()
                 )
             except Exception as e:
                 if "Message is not modified" not in str(e):
                     raise
 
+@instrument_handler
+async def chat_member_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Keep the membership cache in sync with joins and leaves"""
+    chat_member = update.chat_member or update.my_chat_member
+    channel_id = match_force_sub_channel(chat_member.chat, BotConfig.FORCE_SUB_CHANNELS)
+    if channel_id is None:
+        return
+    
+    if update.my_chat_member:
+        # The bot's own status changed, cached answers for this channel can't be trusted
+        bot_instance.membership.invalidate_channel(channel_id)
+        return
+    
+    new_member = chat_member.new_chat_member
+    # Any status change means a pending join request was approved or is moot
+    bot_instance.join_requests.discard(new_member.user.id, channel_id)
+    bot_instance.membership.set(
+        new_member.user.id,
+        channel_id,
+        new_member.status not in ['left', 'kicked']
+    )
+
+@instrument_handler
+async def join_request_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Record new join requests to force-sub channels"""
+    join_request = update.chat_join_request
+    channel_id = match_force_sub_channel(join_request.chat, BotConfig.FORCE_SUB_CHANNELS)
+    if channel_id is not None:
+        bot_instance.join_requests.add(join_request.from_user.id, channel_id)
+
+@instrument_handler
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Statistics command (Owner only)"""
     if update.effective_user.id != BotConfig.OWNER_ID:
         await update.message.reply_text(
-            bot_instance.stylize_text("❌ ʏᴏᴜ ᴀʀᴇ ᴜɴᴀᴜᴛʜᴏʀɪᴢᴇᴅ")
+            bot_instance.messages["unauthorized"]
         )
         return
     
-    # Get statistics
-    total_users = bot_instance.users_collection.count_documents({})
-    today = datetime.now().strftime("%Y-%m-%d")
-    today_stats = bot_instance.stats_collection.find_one({"type": "daily", "date": today})
-    today_queries = today_stats.get("queries", 0) if today_stats else 0
+    # Get statistics (live counters, no database round trip)
+    stats = bot_instance.stats.snapshot()
+    errors = ", ".join(f"{source}: `{count}`" for source, count in stats["errors"].items()) or "`0`"
+    
+    # Cache effectiveness (every hit is an upstream call saved)
+    cache_lines = []
+    for provider, counters in bot_instance.cache.stats.items():
+        served = counters["hits"] + counters["stale"]
+        total = served + counters["misses"]
+        hit_rate = (served / total * 100) if total else 0
+        cache_lines.append(
+            f"• {provider}: `{counters['hits']}` ʜɪᴛ / `{counters['stale']}` sᴛᴀʟᴇ / "
+            f"`{counters['misses']}` ᴍɪss (`{hit_rate:.1f}%`)"
+        )
+    cache_stats = "💾 ᴄᴀᴄʜᴇ:\n" + "\n".join(cache_lines)
+    
+    # Get access key stats (state and remaining monthly quota per key)
+    key_summary = bot_instance.key_pool.summary()
+    key_lines = [f"🔑 ᴀᴄᴄᴇss ᴋᴇʏs: {len(key_summary)} ᴋᴇʏs ʟᴏᴀᴅᴇᴅ"]
+    for key in key_summary:
+        line = (
+            f"• `{key['key']}`: {key['state']}, `{key['remaining']}/{BotConfig.API_KEY_MONTHLY_QUOTA}` ʟᴇꜰᴛ, "
+            f"`{stats['key_usage'].get(key['key'], 0)}` ᴄᴀʟʟs ᴛᴏᴅᴀʏ"
+        )
+        if key["reset_at"]:
+            line += f" (ʀᴇsᴇᴛs `{key['reset_at']:%Y-%m-%d}`)"
+        key_lines.append(line)
+    key_stats = "\n".join(key_lines)
     
-    # Get access key stats (mock for now)
-    key_stats = f"🔑 ᴀᴄᴄᴇss ᴋᴇʏs: {len(bot_instance.access_keys)} ᴋᴇʏs ʟᴏᴀᴅᴇᴅ"
+    # Upstream circuit breakers
+    breaker_lines = ["🔌 ᴜᴘsᴛʀᴇᴀᴍs:"]
+    for provider, breaker in bot_instance.breakers.items():
+        state = breaker.snapshot()
+        latency = bot_instance.latency[provider].snapshot()
+        percentiles = " / ".join(
+            f"{name} `{latency[name] * 1000:.0f}ms`" if latency[name] is not None else f"{name} `-`"
+            for name in ("p50", "p95", "p99")
+        )
+        # In backticks: "half_open" would otherwise open a Markdown italic entity
+        breaker_lines.append(
+            f"• {provider}: `{state['state']}`, `{state['failure_rate'] * 100:.0f}%` ꜰᴀɪʟᴇᴅ "
+            f"(ʟᴀsᴛ `{state['calls']}` ᴄᴀʟʟs), {percentiles}"
+        )
+    breaker_stats = "\n".join(breaker_lines)
     
     stats_text = f"""
 📊 **ʙᴏᴛ sᴛᴀᴛɪsᴛɪᴄs**
 
-👥 ᴛᴏᴛᴀʟ ᴜsᴇʀs: `{total_users}`
-🔍 ᴛᴏᴅᴀʏ's ǫᴜᴇʀɪᴇs: `{today_queries}`
-📅 ᴅᴀᴛᴇ: `{today}`
+👥 ᴛᴏᴛᴀʟ ᴜsᴇʀs: `{stats['total_users']}`
+🆕 ɴᴇᴡ ᴜsᴇʀs ᴛᴏᴅᴀʏ: `{stats['new_users']}`
+🔍 ᴛᴏᴅᴀʏ's ǫᴜᴇʀɪᴇs: `{stats['queries']}`
+⚠️ ᴇʀʀᴏʀs ᴛᴏᴅᴀʏ: {errors}
+📅 ᴅᴀᴛᴇ: `{stats['date']}`
 
-{key_stats}
+{cache_stats}
+
+{breaker_stats}
 
-🔄 ᴄᴜʀʀᴇɴᴛ ᴋᴇʏ ɪɴᴅᴇx: `{bot_instance.current_key_index}`
+{key_stats}
     """
     
     await update.message.reply_text(
@@ -591,85 +787,203 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode=ParseMode.MARKDOWN
     )
 
+@instrument_handler
 async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Broadcast command (Owner only)"""
     if update.effective_user.id != BotConfig.OWNER_ID:
         await update.message.reply_text(
-            bot_instance.stylize_text("❌ ʏᴏᴜ ᴀʀᴇ ᴜɴᴀᴜᴛʜᴏʀɪᴢᴇᴅ")
+            bot_instance.messages["unauthorized"]
         )
         return
     
     if not context.args:
         await update.message.reply_text(
-            bot_instance.stylize_text("📢 ᴜsᴀɢᴇ: /broadcast <ᴍᴇssᴀɢᴇ>")
+            bot_instance.messages["broadcast_usage"]
         )
         return
     
     message = ' '.join(context.args)
-    users = list(bot_instance.users_collection.find({}, {"user_id": 1}))
-    
-    sent = 0
-    failed = 0
     
     progress_msg = await update.message.reply_text(
-        bot_instance.stylize_text("📤 sᴛᴀʀᴛɪɴɢ ʙʀᴏᴀᴅᴄᴀsᴛ...")
+        bot_instance.messages["broadcast_start"]
     )
     
-    for user in users:
-        try:
-            await context.bot.send_message(
-                chat_id=user["user_id"],
-                text=message,
-                parse_mode=ParseMode.MARKDOWN
-            )
-            sent += 1
-        except:
-            failed += 1
-    
-    await progress_msg.edit_text(
-        f"📢 **ʙʀᴏᴀᴅᴄᴀsᴛ ᴄᴏᴍᴘʟᴇᴛᴇᴅ**\n\n"
-        f"✅ sᴇɴᴛ: `{sent}`\n"
-        f"❌ ꜰᴀɪʟᴇᴅ: `{failed}`\n"
-        f"👥 ᴛᴏᴛᴀʟ: `{len(users)}`",
-        parse_mode=ParseMode.MARKDOWN
+    # Runs in the background; progress is edited into progress_msg
+    await bot_instance.broadcasts.start_job(
+        context.bot, message, progress_msg.chat_id, progress_msg.message_id
     )
 
+@instrument_handler
 async def data_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Export data command (Owner only)"""
     if update.effective_user.id != BotConfig.OWNER_ID:
         await update.message.reply_text(
-            bot_instance.stylize_text("❌ ʏᴏᴜ ᴀʀᴇ ᴜɴᴀᴜᴛʜᴏʀɪᴢᴇᴅ")
+            bot_instance.messages["unauthorized"]
         )
         return
     
     try:
-        # Export users data
-        users_data = list(bot_instance.users_collection.find({}))
-        queries_data = list(bot_instance.queries_collection.find({}))
-        
-        # Convert to DataFrames
-        users_df = pd.DataFrame(users_data)
-        queries_df = pd.DataFrame(queries_data)
-        
-        # Create Excel file
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            users_df.to_excel(writer, sheet_name='Users', index=False)
-            queries_df.to_excel(writer, sheet_name='Queries', index=False)
-        
-        buffer.seek(0)
-        
-        await update.message.reply_document(
-            document=buffer,
-            filename=f"bot_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-            caption=bot_instance.stylize_text("📊 ʙᴏᴛ ᴅᴀᴛᴀ ᴇxᴘᴏʀᴛ")
+        params = parse_export_args(context.args)
+    except ValueError:
+        # Plain ASCII so the command and keywords stay typeable
+        await update.message.reply_text(EXPORT_USAGE)
+        return
+    
+    progress_msg = await update.message.reply_text(bot_instance.messages["export_starting"])
+    try:
+        # Runs in a worker process; progress is edited into progress_msg
+        job_id = bot_instance.exports.start(
+            context.bot, params, progress_msg.chat_id, progress_msg.message_id
         )
-        
+    except RuntimeError:
+        # Job id unstyled, so it can be copied into /cancelexport
+        await progress_msg.edit_text(
+            bot_instance.messages.format("export_running", job_id=bot_instance.exports.current.job_id),
+            parse_mode=ParseMode.HTML
+        )
+        return
+    
+    await progress_msg.edit_text(
+        bot_instance.messages.format("export_queued", job_id=job_id),
+        parse_mode=ParseMode.HTML
+    )
+
+@instrument_handler
+async def cancel_export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Cancel the running export (Owner only)"""
+    if update.effective_user.id != BotConfig.OWNER_ID:
+        await update.message.reply_text(
+            bot_instance.messages["unauthorized"]
+        )
+        return
+    
+    if not context.args:
+        await update.message.reply_text(
+            bot_instance.messages["cancelexport_usage"]
+        )
+        return
+    
+    if bot_instance.exports.cancel(context.args[0]):
+        await update.message.reply_text(bot_instance.messages["export_cancelling"])
+    else:
+        await update.message.reply_text(bot_instance.messages["export_not_found"])
+
+@instrument_handler
+async def indexes_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Index usage command (Owner only)"""
+    if update.effective_user.id != BotConfig.OWNER_ID:
+        await update.message.reply_text(
+            bot_instance.messages["unauthorized"]
+        )
+        return
+    
+    try:
+        usage = await bot_instance.db.index_usage()
     except Exception as e:
         await update.message.reply_text(
-            bot_instance.stylize_text(f"❌ ᴇʀʀᴏʀ ᴇxᴘᴏʀᴛɪɴɡ ᴅᴀᴛᴀ: {str(e)}")
+            bot_instance.messages.render("indexes_error", error=e)
+        )
+        return
+    
+    lines = ["📇 <b>ɪɴᴅᴇx ᴜsᴀɢᴇ</b>"]
+    for collection, indexes in usage.items():
+        lines.append(f"\n<b>{collection}</b>")
+        for index in indexes:
+            accesses = index.get("accesses", {})
+            since = accesses.get("since")
+            since_text = since.strftime("%Y-%m-%d %H:%M") if since else "-"
+            lines.append(f"• <code>{index['name']}</code>: {accesses.get('ops', 0)} ᴏᴘs sɪɴᴄᴇ {since_text}")
+    
+    await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+
+def resolve_key_arg(arg: str) -> Optional[str]:
+    """Key referenced by its /keys number or by its full value"""
+    keys = list(bot_instance.key_pool.keys)
+    if arg.isdigit() and 1 <= int(arg) <= len(keys):
+        return keys[int(arg) - 1]
+    return arg if arg in bot_instance.key_pool.keys else None
+
+@instrument_handler
+async def keys_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """List API keys with their state (Owner only)"""
+    if update.effective_user.id != BotConfig.OWNER_ID:
+        await update.message.reply_text(
+            bot_instance.messages["unauthorized"]
+        )
+        return
+    
+    messages = bot_instance.messages
+    lines = [messages["keys_title"]]
+    for index, key in enumerate(bot_instance.key_pool.summary(), 1):
+        lines.append(messages.format(
+            "keys_line", index=index, key=key['key'], state=key['state'],
+            remaining=key['remaining'], quota=BotConfig.API_KEY_MONTHLY_QUOTA
+        ))
+    if len(lines) == 1:
+        lines.append(messages["keys_empty"])
+    lines.append(messages["keys_footer"])
+    await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.MARKDOWN)
+
+@instrument_handler
+async def addkey_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Add an API key at runtime (Owner only)"""
+    if update.effective_user.id != BotConfig.OWNER_ID:
+        await update.message.reply_text(
+            bot_instance.messages["unauthorized"]
+        )
+        return
+    
+    if not context.args:
+        await update.message.reply_text(bot_instance.messages["addkey_usage"])
+        return
+    
+    key = context.args[0].strip()
+    if key in bot_instance.key_pool.keys:
+        await update.message.reply_text(bot_instance.messages["key_already_loaded"])
+        return
+    
+    bot_instance.api_keys.add_key(key)
+    await reload_key_pool()
+    await update.message.reply_text(
+        bot_instance.messages.format("key_added", key=mask_key(key)),
+        parse_mode=ParseMode.MARKDOWN
+    )
+
+async def set_key_enabled(update: Update, context: ContextTypes.DEFAULT_TYPE, enabled: bool):
+    if update.effective_user.id != BotConfig.OWNER_ID:
+        await update.message.reply_text(
+            bot_instance.messages["unauthorized"]
+        )
+        return
+    
+    key = resolve_key_arg(context.args[0]) if context.args else None
+    if key is None:
+        await update.message.reply_text(
+            bot_instance.messages["unknown_key"]
         )
+        return
+    
+    if enabled:
+        bot_instance.key_pool.enable(key)
+    else:
+        bot_instance.key_pool.disable(key)
+    await bot_instance.key_pool.persist(bot_instance.db.collection('api_keys'))
+    await update.message.reply_text(
+        bot_instance.messages.format("key_enabled" if enabled else "key_disabled", key=mask_key(key)),
+        parse_mode=ParseMode.MARKDOWN
+    )
+
+@instrument_handler
+async def disablekey_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Stop using an API key (Owner only)"""
+    await set_key_enabled(update, context, enabled=False)
 
+@instrument_handler
+async def enablekey_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Use a disabled, exhausted or invalid API key again (Owner only)"""
+    await set_key_enabled(update, context, enabled=True)
+
+@instrument_handler
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Help command handler"""
     help_text = (
@@ -677,62 +991,221 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "• <b>Send any Indian phone number</b> to get details.\n"
         "• <b>/stats</b> — Show bot statistics (owner only).\n"
         "• <b>/broadcast &lt;message&gt;</b> — Send message to all users (owner only).\n"
-        "• <b>/data</b> — Export user and query data (owner only).\n"
+        "• <b>/data [xlsx|csv|jsonl] [users|queries|all] [from:YYYY-MM-DD] [to:YYYY-MM-DD]</b> — Export user and query data (owner only).\n"
+        "• <b>/cancelexport &lt;job_id&gt;</b> — Cancel the running export (owner only).\n"
+        "• <b>/keys</b>, <b>/addkey</b>, <b>/disablekey</b>, <b>/enablekey</b> — Manage API keys (owner only).\n"
+        "• <b>/indexes</b> — Show database index usage (owner only).\n"
         "\n"
         "Join our channels for updates!"
     )
     await update.message.reply_text(help_text, parse_mode=ParseMode.HTML)
 
-async def get_channel_invite_link(bot: Bot, channel_id: str) -> str:
-    try:
-        chat = await bot.get_chat(channel_id)
-        if chat.username:
-            return f"https://t.me/{chat.username}"
-        # For private channel, create join request link
-        invite = await bot.create_chat_invite_link(
-            chat_id=channel_id,
-            creates_join_request=True  # <-- yeh line add karein
-        )
-        return invite.invite_link
-    except Exception as e:
-        return None
+def has_pending_join_request(user_id: int, channel_id: str) -> bool:
+    return bot_instance.join_requests.has(user_id, channel_id)
 
-async def has_pending_join_request(user_id: int, channel_id: str) -> bool:
-    try:
-        print(f"Checking join requests for channel: {channel_id}")
-        async for req in userbot.get_chat_join_requests(int(channel_id)):
-            print(f"Found join request from: {req.user.id}")
-            if req.user.id == user_id:
-                print("User has pending join request!")
-                return True
-        print("No join request found for user.")
-    except Exception as e:
-        print(f"Error in has_pending_join_request: {e}")
-    return False
+async def resync_join_requests():
+    """Rebuild the pending join request index with one userbot pass per channel"""
+    for channel in BotConfig.FORCE_SUB_CHANNELS:
+        channel_id = str(channel["id"])
+        chat_id = int(channel_id) if channel_id.lstrip("-").isdigit() else channel_id
+        try:
+            requesters = set()
+            async for req in userbot.get_chat_join_requests(chat_id):
+                requesters.add(req.user.id)
+            bot_instance.join_requests.replace(channel_id, requesters)
+            logger.info(f"Synced {len(requesters)} pending join requests for {channel_id}")
+        except Exception as e:
+            logger.error(f"Join request resync error for {channel_id}: {e}")
+
+async def join_request_resync_loop():
+    """Resync pending join requests at startup and then every interval"""
+    while True:
+        await resync_join_requests()
+        await asyncio.sleep(BotConfig.JOIN_REQUEST_RESYNC_INTERVAL)
+
+async def invite_link_refresh_loop(bot: Bot):
+    """Re-check invite links periodically, regenerating revoked ones.
+
+    Channels left without a link (e.g. get_chat failed at startup) are
+    retried with backoff instead of waiting for the next full refresh.
+    """
+    attempt = 0
+    next_refresh = time.monotonic() + BotConfig.INVITE_LINK_REFRESH_INTERVAL
+    while True:
+        missing = bot_instance.invite_links.missing()
+        delay = next_refresh - time.monotonic()
+        if missing:
+            delay = min(delay, backoff_delay(attempt, BotConfig.INVITE_LINK_RETRY_BASE, BotConfig.INVITE_LINK_RETRY_CAP))
+            attempt += 1
+        await asyncio.sleep(max(delay, 0))
+        if time.monotonic() >= next_refresh:
+            next_refresh = time.monotonic() + BotConfig.INVITE_LINK_REFRESH_INTERVAL
+            await bot_instance.invite_links.refresh(bot)
+        else:
+            await bot_instance.invite_links.refresh(bot, missing)
+        if not bot_instance.invite_links.missing():
+            attempt = 0
+
+async def stats_checkpoint_loop():
+    """Write live stats counters to Mongo every interval"""
+    while True:
+        await asyncio.sleep(BotConfig.STATS_CHECKPOINT_INTERVAL)
+        await bot_instance.stats.checkpoint(bot_instance.db)
+
+async def rate_limit_persist_loop():
+    """Persist rate limit counters every interval"""
+    while True:
+        await asyncio.sleep(BotConfig.RATE_LIMIT_PERSIST_INTERVAL)
+        await bot_instance.rate_limiter.persist(bot_instance.db.collection('rate_limits'))
+
+async def key_pool_persist_loop():
+    """Persist API key state every interval"""
+    while True:
+        await asyncio.sleep(BotConfig.KEY_POOL_PERSIST_INTERVAL)
+        await bot_instance.key_pool.persist(bot_instance.db.collection('api_keys'))
+
+async def reload_key_pool():
+    """Swap the file's current keys into the pool without touching in-flight lookups"""
+    added = bot_instance.key_pool.sync_keys(bot_instance.api_keys.keys)
+    if added:
+        # Keys seen before keep their persisted state
+        await bot_instance.key_pool.load(bot_instance.db.collection('api_keys'), added)
+
+async def keys_file_watch_loop():
+    """Reload access_keys.txt whenever it changes"""
+    while True:
+        await asyncio.sleep(BotConfig.KEYS_FILE_POLL_INTERVAL)
+        if bot_instance.api_keys.has_changed():
+            bot_instance.api_keys.reload_keys()
+            await reload_key_pool()
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+def register_gauges():
+    """Scrape-time gauges for key pool state, circuits and queue depths"""
+    REGISTRY.gauge(
+        "bot_api_keys", "API keys per state", ("state",),
+        lambda: Counter((record["state"],) for record in bot_instance.key_pool.keys.values())
+    )
+    REGISTRY.gauge(
+        "bot_api_key_remaining", "Monthly quota left per key", ("key",),
+        lambda: {(mask_key(key),): bot_instance.key_pool.remaining(key) for key in bot_instance.key_pool.keys}
+    )
+    REGISTRY.gauge(
+        "bot_circuit_state", "Upstream circuit (0 closed, 1 half-open, 2 open)", ("provider",),
+        lambda: {
+            (provider,): CIRCUIT_STATES[breaker.snapshot()["state"]]
+            for provider, breaker in bot_instance.breakers.items()
+        }
+    )
+    REGISTRY.gauge(
+        "bot_queue_depth", "Items waiting in internal queues", ("queue",),
+        lambda: {
+            ("query_writes",): bot_instance.db.queue_depth(),
+            ("cache_writes",): len(bot_instance.cache.pending_writes),
+            ("log_channel",): len(bot_instance.log_channel.pending),
+            ("inflight_lookups",): len(bot_instance.inflight.calls),
+            ("background_tasks",): len(background_tasks),
+            ("broadcasts",): len(bot_instance.broadcasts.tasks),
+            ("exports",): int(bot_instance.exports.current is not None)
+        }
+    )
+
+metrics_server = MetricsServer(REGISTRY, BotConfig.METRICS_HOST, BotConfig.METRICS_PORT)
+
+async def on_startup(application: Application):
+    """Create shared resources once the application is initialized"""
+    await bot_instance.http.start()
+    await bot_instance.db.ensure_indexes()
+    await bot_instance.db.init_stats()
+    await bot_instance.stats.rebuild(bot_instance.db)
+    spawn_background(stats_checkpoint_loop())
+    await bot_instance.rate_limiter.load(bot_instance.db.collection('rate_limits'))
+    spawn_background(rate_limit_persist_loop())
+    await bot_instance.key_pool.load(bot_instance.db.collection('api_keys'))
+    spawn_background(key_pool_persist_loop())
+    spawn_background(keys_file_watch_loop())
+    await bot_instance.db.start()
+    await bot_instance.cache.ensure_indexes()
+    spawn_background(join_request_resync_loop())
+    await bot_instance.invite_links.refresh(application.bot)
+    spawn_background(invite_link_refresh_loop(application.bot))
+    await bot_instance.broadcasts.resume_all(application.bot)
+    bot_instance.log_channel.start(application.bot)
+    if BotConfig.METRICS_ENABLED:
+        register_gauges()
+        await metrics_server.start()
+
+async def on_stop(application: Application):
+    """Flush queued log channel events while the bot can still send"""
+    await bot_instance.log_channel.stop(application.bot)
+
+async def on_shutdown(application: Application):
+    """Release shared resources on graceful shutdown"""
+    for task in list(background_tasks):
+        task.cancel()
+    await metrics_server.stop()
+    await bot_instance.broadcasts.stop()
+    await bot_instance.exports.shutdown()
+    await bot_instance.http.close()
+    await bot_instance.stats.checkpoint(bot_instance.db)
+    await bot_instance.rate_limiter.persist(bot_instance.db.collection('rate_limits'))
+    await bot_instance.key_pool.persist(bot_instance.db.collection('api_keys'))
+    await bot_instance.db.close()
 
 async def main():
     # Start userbot (await karo)
     await userbot.start()
-    print("✅ Userbot started!")
+    logger.info("Userbot started")
 
     # Create application
-    application = Application.builder()\
+    builder = Application.builder()\
         .token(BotConfig.BOT_TOKEN)\
         .concurrent_updates(10)\
-        .build()
+        .post_init(on_startup)\
+        .post_stop(on_stop)\
+        .post_shutdown(on_shutdown)
+    if BotConfig.METRICS_ENABLED:
+        # Count Bot API calls (same pool size as the builder's default request)
+        builder = builder.request(InstrumentedRequest(connection_pool_size=256))
+    application = builder.build()
     
     # Add handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("stats", stats_command))
     application.add_handler(CommandHandler("broadcast", broadcast_command))
     application.add_handler(CommandHandler("data", data_command))
+    application.add_handler(CommandHandler("cancelexport", cancel_export_command))
+    application.add_handler(CommandHandler("keys", keys_command))
+    application.add_handler(CommandHandler("addkey", addkey_command))
+    application.add_handler(CommandHandler("disablekey", disablekey_command))
+    application.add_handler(CommandHandler("enablekey", enablekey_command))
+    application.add_handler(CommandHandler("indexes", indexes_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CallbackQueryHandler(callback_handler))
+    application.add_handler(ChatMemberHandler(chat_member_handler, ChatMemberHandler.ANY_CHAT_MEMBER))
+    application.add_handler(ChatJoinRequestHandler(join_request_handler))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     
     # Run the bot
-    print("🚀 Bot is starting...")
-    await application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if BotConfig.WEBHOOK_ENABLED:
+        logger.info(
+            f"Bot is starting (webhook on {BotConfig.WEBHOOK_LISTEN}:{BotConfig.WEBHOOK_PORT}"
+            f"/{BotConfig.WEBHOOK_PATH})"
+        )
+        # TLS terminates at the reverse proxy, so the local server speaks plain HTTP
+        await application.run_webhook(
+            listen=BotConfig.WEBHOOK_LISTEN,
+            port=BotConfig.WEBHOOK_PORT,
+            url_path=BotConfig.WEBHOOK_PATH,
+            webhook_url=BotConfig.WEBHOOK_URL,
+            secret_token=BotConfig.WEBHOOK_SECRET,
+            max_connections=BotConfig.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=Update.ALL_TYPES
+        )
+    else:
+        logger.info("Bot is starting")
+        await application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == "__main__":
     import sys
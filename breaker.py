@@ -0,0 +1,90 @@
+# breaker.py - Per-upstream circuit breaker
+
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class SourceUnavailable(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+    def __init__(self, provider: str):
+        super().__init__(f"{provider} is unavailable")
+        self.provider = provider
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker driven by error rate and latency.
+
+    Calls slower than `slow_call_seconds` count as failures. When the failure
+    rate over the last `window` calls reaches `error_rate`, the circuit opens
+    for `open_seconds`; then a single probe call is let through and its
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, error_rate: float = 0.5,
+                 slow_call_seconds: float = 8.0, open_seconds: float = 30.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.outcomes = deque(maxlen=window)  # True for failures
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def is_open(self) -> bool:
+        """True while calls are being rejected (open and not yet due for a probe)"""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.open_seconds
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (claims the probe slot when half-open)"""
+        if self.state == OPEN:
+            if self.is_open():
+                return False
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+            logger.warning(f"Circuit {self.name} half-open, probing")
+        if self.state == HALF_OPEN:
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def record(self, success: bool, latency: float) -> None:
+        failed = not success or latency >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = False
+            if failed:
+                self._open()
+            else:
+                self.state = CLOSED
+                self.outcomes.clear()
+                logger.warning(f"Circuit {self.name} closed")
+            return
+
+        self.outcomes.append(failed)
+        if self.state == CLOSED and len(self.outcomes) >= self.min_calls:
+            if sum(self.outcomes) / len(self.outcomes) >= self.error_rate:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        logger.warning(f"Circuit {self.name} opened for {self.open_seconds:.0f}s")
+
+    def snapshot(self) -> dict:
+        failures = sum(self.outcomes)
+        return {
+            "state": OPEN if self.is_open() else (HALF_OPEN if self.state != CLOSED else CLOSED),
+            "failure_rate": failures / len(self.outcomes) if self.outcomes else 0.0,
+            "calls": len(self.outcomes)
+        }
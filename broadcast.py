@@ -0,0 +1,192 @@
+# broadcast.py - Resumable, rate-limited broadcast jobs
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from telegram import Bot
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Progress message title per job status
+TITLES = {
+    "running": "📤 **ʙʀᴏᴀᴅᴄᴀsᴛ ɪɴ ᴘʀᴏɢʀᴇss**",
+    "done": "📢 **ʙʀᴏᴀᴅᴄᴀsᴛ ᴄᴏᴍᴘʟᴇᴛᴇᴅ**",
+    "failed": "⚠️ **ʙʀᴏᴀᴅᴄᴀsᴛ sᴛᴏᴘᴘᴇᴅ**"
+}
+
+
+class SendRateLimiter:
+    """Spaces out sends to at most `rate` per second across all tasks"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        loop = asyncio.get_running_loop()
+        async with self.lock:
+            now = loop.time()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every sender back, e.g. after a flood-wait"""
+        self.next_at = max(self.next_at, asyncio.get_running_loop().time() + seconds)
+
+
+class BroadcastManager:
+    """Broadcast jobs stored in Mongo so they survive restarts.
+
+    Recipients are streamed from a cursor ordered by user_id and sent in
+    batches; after each batch the job's last_user_id and counters are
+    checkpointed, so a resumed job continues where it stopped.
+    """
+
+    def __init__(self, db, rate: float = 25, batch_size: int = 50,
+                 progress_interval: float = 10, max_retries: int = 3):
+        self.db = db
+        self.jobs = db.collection("broadcasts")
+        self.limiter = SendRateLimiter(rate)
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.max_retries = max_retries
+        self.tasks = set()
+
+    async def start_job(self, bot: Bot, text: str, chat_id: int, message_id: int):
+        """Create a job and run it in the background; returns the job id"""
+        job = {
+            "text": text,
+            "status": "running",
+            "last_user_id": None,
+            "sent": 0,
+            "failed": 0,
+            "blocked": 0,
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "created_at": datetime.now()
+        }
+        result = await self.jobs.insert_one(job)
+        job["_id"] = result.inserted_id
+        self._spawn(bot, job)
+        return job["_id"]
+
+    async def resume_all(self, bot: Bot) -> None:
+        """Resume jobs interrupted by a restart"""
+        async for job in self.jobs.find({"status": "running"}):
+            logger.warning(f"Resuming broadcast {job['_id']} after user {job['last_user_id']}")
+            self._spawn(bot, job)
+
+    async def stop(self) -> None:
+        """Stop running jobs; they stay 'running' in Mongo and resume on next start"""
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def _spawn(self, bot: Bot, job: Dict) -> None:
+        task = asyncio.create_task(self._run(bot, job))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, bot: Bot, job: Dict) -> None:
+        try:
+            query = {"blocked": {"$ne": True}}
+            if job["last_user_id"] is not None:
+                query["user_id"] = {"$gt": job["last_user_id"]}
+            cursor = self.db.users.find(query, {"user_id": 1}).sort("user_id", 1).batch_size(self.batch_size)
+
+            last_progress = asyncio.get_running_loop().time()
+            batch = []
+            async for user in cursor:
+                batch.append(user["user_id"])
+                if len(batch) >= self.batch_size:
+                    await self._send_batch(bot, job, batch)
+                    batch = []
+                    if asyncio.get_running_loop().time() - last_progress >= self.progress_interval:
+                        await self._edit_progress(bot, job, "running")
+                        last_progress = asyncio.get_running_loop().time()
+            if batch:
+                await self._send_batch(bot, job, batch)
+
+            await self.jobs.update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": "done", "finished_at": datetime.now()}}
+            )
+            await self._edit_progress(bot, job, "done")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {job['_id']} stopped: {e}")
+            # Not resumed on restart; the owner can start a new broadcast
+            try:
+                await self.jobs.update_one(
+                    {"_id": job["_id"]},
+                    {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.now()}}
+                )
+            except Exception as update_error:
+                logger.error(f"Could not mark broadcast {job['_id']} failed: {update_error}")
+            await self._edit_progress(bot, job, "failed", error=type(e).__name__)
+
+    async def _send_batch(self, bot: Bot, job: Dict, user_ids: List[int]) -> None:
+        results = await asyncio.gather(*(self._send(bot, job["text"], user_id) for user_id in user_ids))
+        counts = {"sent": 0, "failed": 0, "blocked": 0}
+        for result in results:
+            counts[result] += 1
+
+        blocked = [user_id for user_id, result in zip(user_ids, results) if result == "blocked"]
+        if blocked:
+            await self.db.users.update_many({"user_id": {"$in": blocked}}, {"$set": {"blocked": True}})
+
+        for field, count in counts.items():
+            job[field] += count
+        job["last_user_id"] = user_ids[-1]
+        await self.jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"last_user_id": job["last_user_id"]}, "$inc": counts}
+        )
+
+    async def _send(self, bot: Bot, text: str, user_id: int) -> str:
+        """Send one message; returns 'sent', 'failed' or 'blocked'"""
+        for _ in range(self.max_retries):
+            await self.limiter.wait()
+            try:
+                await bot.send_message(chat_id=user_id, text=text, parse_mode=ParseMode.MARKDOWN)
+                return "sent"
+            except RetryAfter as e:
+                self.limiter.pause(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except Forbidden:
+                # Bot blocked by the user or account deactivated
+                return "blocked"
+            except BadRequest as e:
+                if "chat not found" in str(e).lower():
+                    return "blocked"
+                return "failed"
+            except TelegramError:
+                return "failed"
+        return "failed"
+
+    async def _edit_progress(self, bot: Bot, job: Dict, status: str, error: Optional[str] = None) -> None:
+        total = job["sent"] + job["failed"] + job["blocked"]
+        # Exception class name only: free-form error text could break the Markdown
+        reason = f"\n⚠️ ᴇʀʀᴏʀ: `{error}`" if error else ""
+        try:
+            await bot.edit_message_text(
+                f"{TITLES[status]}\n\n"
+                f"✅ sᴇɴᴛ: `{job['sent']}`\n"
+                f"❌ ꜰᴀɪʟᴇᴅ: `{job['failed']}`\n"
+                f"🚫 ʙʟᴏᴄᴋᴇᴅ: `{job['blocked']}`\n"
+                f"👥 ᴛᴏᴛᴀʟ: `{total}`{reason}",
+                chat_id=job["chat_id"],
+                message_id=job["message_id"],
+                parse_mode=ParseMode.MARKDOWN
+            )
+        except TelegramError as e:
+            if "Message is not modified" not in str(e):
+                logger.error(f"Broadcast progress edit error: {e}")
@@ -0,0 +1,127 @@
+# cache.py - Two-tier cache for upstream lookup results
+
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LookupCache:
+    """In-process LRU in front of a shared MongoDB collection with TTL expiry.
+
+    Each entry is fresh for its provider's TTL, then served as stale for
+    `stale_ttl` more seconds (so the caller can refresh it in the background),
+    after which MongoDB's TTL monitor removes it.
+    """
+
+    def __init__(self, collection, ttls: Dict[str, int], stale_ttl: int, max_entries: int):
+        self.collection = collection
+        self.ttls = ttls
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        # (provider, number) -> (data, fresh_until, expires_at)
+        self.entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self.stats = {provider: {"hits": 0, "stale": 0, "misses": 0} for provider in ttls}
+        # Strong references to background writes until they finish
+        self.pending_writes = set()
+
+    async def ensure_indexes(self) -> None:
+        """Create the TTL index that expires shared entries"""
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def _remember(self, key: Tuple[str, str], entry: tuple) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def _load(self, provider: str, number: str) -> Optional[tuple]:
+        """Read an entry from the shared collection"""
+        try:
+            doc = await self.collection.find_one({"_id": f"{provider}:{number}"})
+        except Exception as e:
+            logger.error(f"Cache read error: {e}")
+            return None
+        if not doc:
+            return None
+        return doc["data"], doc["fresh_until"], doc["expires_at"]
+
+    async def get(self, provider: str, number: str) -> Tuple[Optional[Dict], bool]:
+        """Return (data, is_stale); data is None on a miss"""
+        key = (provider, number)
+        now = datetime.utcnow()
+        entry = self.entries.get(key)
+        if entry is None or entry[2] <= now:
+            entry = await self._load(provider, number)
+            if entry is not None:
+                self._remember(key, entry)
+        else:
+            self.entries.move_to_end(key)
+
+        counters = self.stats.setdefault(provider, {"hits": 0, "stale": 0, "misses": 0})
+        # The TTL monitor runs once a minute, so expired documents may still be read
+        if entry is None or entry[2] <= now:
+            counters["misses"] += 1
+            return None, False
+        is_stale = entry[1] <= now
+        counters["stale" if is_stale else "hits"] += 1
+        return entry[0], is_stale
+
+    def peek(self, provider: str, number: str) -> Optional[Dict]:
+        """Last in-process result, even past expiry (for degraded mode); not counted in stats"""
+        entry = self.entries.get((provider, number))
+        return entry[0] if entry is not None else None
+
+    def set(self, provider: str, number: str, data: Dict) -> None:
+        """Store a result; the shared write happens in the background"""
+        now = datetime.utcnow()
+        fresh_until = now + timedelta(seconds=self.ttls.get(provider, 0))
+        expires_at = fresh_until + timedelta(seconds=self.stale_ttl)
+        self._remember((provider, number), (data, fresh_until, expires_at))
+
+        doc = {
+            "provider": provider,
+            "number": number,
+            "data": data,
+            "fresh_until": fresh_until,
+            "expires_at": expires_at
+        }
+        future = asyncio.ensure_future(
+            self.collection.replace_one({"_id": f"{provider}:{number}"}, doc, upsert=True)
+        )
+        self.pending_writes.add(future)
+        future.add_done_callback(self._write_done)
+
+    def _write_done(self, future: asyncio.Future) -> None:
+        self.pending_writes.discard(future)
+        if not future.cancelled() and future.exception():
+            logger.error(f"Cache write error: {future.exception()}")
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    Callers await the shared task through asyncio.shield, so cancelling one
+    waiter never cancels the fetch the others are waiting on.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable]):
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.create_task(call())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        # Retrieve the exception so it is not reported when every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
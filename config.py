@@ -1,23 +1,44 @@
 # config.py - Configuration file for Truecaller Bot
 
+import logging
 import os
+import re
 from dotenv import load_dotenv
 
+from styling import stylize
+
 load_dotenv()  # .env file load karega
 
+logger = logging.getLogger(__name__)
+
 class BotConfig:
     # Telegram Bot Token (Get from @BotFather)
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     
     # MongoDB Configuration
     MONGO_URI = os.getenv("MONGO_URI")
+    MONGO_POOL_SIZE = int(os.getenv("MONGO_POOL_SIZE", "50"))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    MONGO_WRITE_CONCERN = os.getenv("MONGO_WRITE_CONCERN", "1")  # e.g. "1" or "majority"
+    
+    # Write-behind buffer for query logging
+    WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "200"))
+    WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "2"))
+    WRITE_QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", "10000"))
+    
+    # Seconds between checkpoints of the in-memory stats counters
+    STATS_CHECKPOINT_INTERVAL = int(os.getenv("STATS_CHECKPOINT_INTERVAL", "60"))
     
     # Owner Telegram User ID (Get from @userinfobot)
     OWNER_ID = int(os.getenv("OWNER_ID", "0"))
 
     # Logging Configuration
-    LOG_LEVEL = "INFO"
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    # One JSON object per log line instead of LOG_FORMAT
+    LOG_JSON = os.getenv("LOG_JSON", "false").lower() in ("1", "true", "yes")
+    # Longest upstream response body written to debug logs
+    LOG_MAX_PAYLOAD = int(os.getenv("LOG_MAX_PAYLOAD", "300"))
     LOG_CHANNEL_ID = int(os.getenv("LOG_CHANNEL_ID", "0"))  # <-- apna log channel ka ID yahan daalein
     
     # Pyrogram Configuration
@@ -29,6 +50,75 @@ class BotConfig:
     TRUECALLER_API_URL = os.getenv("TRUECALLER_API_URL")
     VALIDATION_API_URL = os.getenv("VALIDATION_API_URL")
     
+    # Upstream HTTP Client (shared connection pool)
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+    
+    # Adaptive upstream timeouts: UPSTREAM_TIMEOUT_MULTIPLIER x the provider's rolling
+    # p99 latency, between UPSTREAM_TIMEOUT_MIN and HTTP_TIMEOUT seconds
+    LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))
+    UPSTREAM_TIMEOUT_MIN = float(os.getenv("UPSTREAM_TIMEOUT_MIN", "2"))
+    UPSTREAM_TIMEOUT_MULTIPLIER = float(os.getenv("UPSTREAM_TIMEOUT_MULTIPLIER", "2"))
+    
+    # Retries on 5xx and connection errors, with jittered exponential backoff
+    UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+    UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.25"))
+    UPSTREAM_BACKOFF_CAP = float(os.getenv("UPSTREAM_BACKOFF_CAP", "2"))
+    
+    # Send a second Truecaller request when the first runs past its p95 latency
+    # (not used for validation, every call there costs key quota)
+    HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "false").lower() in ("1", "true", "yes")
+    
+    # Prometheus text-format metrics endpoint (off by default, binds to localhost)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+    
+    # Receive updates through a webhook instead of long polling. Telegram POSTs to
+    # WEBHOOK_URL (the public https URL of the reverse proxy), which forwards to
+    # WEBHOOK_LISTEN:WEBHOOK_PORT/WEBHOOK_PATH. Requests without WEBHOOK_SECRET in
+    # the X-Telegram-Bot-Api-Secret-Token header are rejected.
+    WEBHOOK_ENABLED = os.getenv("WEBHOOK_ENABLED", "false").lower() in ("1", "true", "yes")
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "webhook")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    
+    # Fraction of handle_message updates traced as a JSON span timeline (0 disables)
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+    
+    # Lookup latency budget: render partial results after LOOKUP_DEADLINE seconds,
+    # keep waiting up to LOOKUP_FOLLOWUP_TIMEOUT seconds for the slower source
+    LOOKUP_DEADLINE = float(os.getenv("LOOKUP_DEADLINE", "4"))
+    LOOKUP_FOLLOWUP_TIMEOUT = float(os.getenv("LOOKUP_FOLLOWUP_TIMEOUT", "30"))
+    
+    # Lookup Result Cache (TTLs in seconds)
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    CACHE_TTL_TRUECALLER = int(os.getenv("CACHE_TTL_TRUECALLER", str(24 * 3600)))
+    CACHE_TTL_VALIDATION = int(os.getenv("CACHE_TTL_VALIDATION", str(30 * 24 * 3600)))
+    CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", str(7 * 24 * 3600)))
+    
+    # Circuit breaker per upstream: open when at least BREAKER_ERROR_RATE of the
+    # last BREAKER_WINDOW calls failed or took BREAKER_SLOW_CALL_SECONDS or longer,
+    # then probe again after BREAKER_OPEN_SECONDS
+    BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+    BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+    BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+    BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "8"))
+    BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+    
+    # Log channel: events are sent as one combined message every
+    # LOG_CHANNEL_FLUSH_INTERVAL seconds or LOG_CHANNEL_BATCH_SIZE events;
+    # beyond LOG_CHANNEL_MAX_PENDING queued events new ones are dropped
+    LOG_CHANNEL_BATCH_SIZE = int(os.getenv("LOG_CHANNEL_BATCH_SIZE", "20"))
+    LOG_CHANNEL_FLUSH_INTERVAL = float(os.getenv("LOG_CHANNEL_FLUSH_INTERVAL", "5"))
+    LOG_CHANNEL_MAX_PENDING = int(os.getenv("LOG_CHANNEL_MAX_PENDING", "500"))
+    
     # Welcome Image URL
     WELCOME_IMAGE = os.getenv("WELCOME_IMAGE")
 
@@ -38,12 +128,41 @@ class BotConfig:
         for i, cid in enumerate(os.getenv("FORCE_SUB_CHANNELS", "").split(",") if os.getenv("FORCE_SUB_CHANNELS") else [])
     ]
     
+    # Seconds a cached channel membership answer stays valid
+    MEMBERSHIP_CACHE_TTL = int(os.getenv("MEMBERSHIP_CACHE_TTL", "600"))
+    
+    # Seconds between full resyncs of pending join requests via the userbot
+    JOIN_REQUEST_RESYNC_INTERVAL = int(os.getenv("JOIN_REQUEST_RESYNC_INTERVAL", "900"))
+    
+    # Seconds between invite link checks (revoked links are regenerated)
+    INVITE_LINK_REFRESH_INTERVAL = int(os.getenv("INVITE_LINK_REFRESH_INTERVAL", "3600"))
+    # Backoff (seconds) for retrying channels whose link could not be resolved
+    INVITE_LINK_RETRY_BASE = float(os.getenv("INVITE_LINK_RETRY_BASE", "5"))
+    INVITE_LINK_RETRY_CAP = float(os.getenv("INVITE_LINK_RETRY_CAP", "300"))
+    
     # Access Keys File Path
     ACCESS_KEYS_FILE = "access_keys.txt"
     
+    # Monthly request quota of each validation API key, and how often key state is saved
+    API_KEY_MONTHLY_QUOTA = int(os.getenv("API_KEY_MONTHLY_QUOTA", "100"))
+    KEY_POOL_PERSIST_INTERVAL = int(os.getenv("KEY_POOL_PERSIST_INTERVAL", "60"))
+    # Seconds between checks of the access keys file for changes
+    KEYS_FILE_POLL_INTERVAL = int(os.getenv("KEYS_FILE_POLL_INTERVAL", "10"))
+    
     # Rate Limiting
     MAX_QUERIES_PER_USER_PER_DAY = int(os.getenv("MAX_QUERIES_PER_USER_PER_DAY", "50"))
     MAX_QUERIES_PER_MINUTE = int(os.getenv("MAX_QUERIES_PER_MINUTE", "10"))
+    RATE_LIMIT_PERSIST_INTERVAL = int(os.getenv("RATE_LIMIT_PERSIST_INTERVAL", "30"))
+    
+    # Broadcasts (Telegram allows roughly 30 messages per second)
+    BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+    BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "50"))
+    BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "10"))
+    
+    # Streaming exports are split into documents of at most this many bytes
+    # (Telegram bots can upload up to 50 MB)
+    EXPORT_PART_BYTES = int(os.getenv("EXPORT_PART_BYTES", str(45 * 1024 * 1024)))
+    EXPORT_PROGRESS_INTERVAL = float(os.getenv("EXPORT_PROGRESS_INTERVAL", "5"))
     
     # Supported Country Code
     COUNTRY_CODE = os.getenv("COUNTRY_CODE", "+91")
@@ -52,7 +171,8 @@ class BotConfig:
     # Valid Starting Digits for Indian Numbers
     VALID_STARTING_DIGITS = os.getenv("VALID_STARTING_DIGITS", "6,7,8,9").split(",")
     
-    # Bot Messages (Stylized)
+    # Bot Messages, styled once at startup by styling.MessageCatalog
+    # ({fields} are filled per reply; everything else is pre-rendered)
     MESSAGES = {
         "welcome": (
             "🎉 ᴡᴇʟᴄᴏᴍᴇ {name}!\n\n"
@@ -67,32 +187,69 @@ class BotConfig:
             "📝 ꜰᴏʀᴍᴀᴛ: 98xxxxxxxx ᴏʀ +919xxxxxxxx\n\n"
             "💡 ᴇxᴀᴍᴘʟᴇ: 9876543210"
         ),
-        "force_sub": (
+        "welcome_force_sub": (
+            "🎉 ᴡᴇʟᴄᴏᴍᴇ {name}!\n\n"
+            "🔍 ɪ ᴄᴀɴ ʜᴇʟᴘ ʏᴏᴜ ꜰɪɴᴅ ᴘʜᴏɴᴇ ɴᴜᴍʙᴇʀ ᴅᴇᴛᴀɪʟs ᴊᴜsᴛ ʟɪᴋᴇ ᴛʀᴜᴇᴄᴀʟʟᴇʀ!\n\n"
             "⚠️ ᴛᴏ ᴜsᴇ ᴛʜɪs ʙᴏᴛ, ʏᴏᴜ ᴍᴜsᴛ ᴊᴏɪɴ ᴏᴜʀ ᴄʜᴀɴɴᴇʟs ꜰɪʀsᴛ:"
         ),
-        "join_channels": (
-            "⚠️ ᴘʟᴇᴀsᴇ ᴊᴏɪɴ ᴀʟʟ ᴄʜᴀɴɴᴇʟs ꜰɪʀsᴛ"
-        ),
+        "force_sub": "⚠️ ᴘʟᴇᴀsᴇ ᴊᴏɪɴ ᴏᴜʀ ᴄʜᴀɴɴᴇʟs ꜰɪʀsᴛ ᴛᴏ ᴜsᴇ ᴛʜᴇ ʙᴏᴛ:",
+        "join_channels": "❌ ᴘʟᴇᴀsᴇ ᴊᴏɪɴ ᴀʟʟ ᴄʜᴀɴɴᴇʟs ꜰɪʀsᴛ",
         "membership_verified": (
             "✅ ᴛʜᴀɴᴋ ʏᴏᴜ ꜰᴏʀ ᴊᴏɪɴɪɴɢ!\n\n"
             "🔍 ɴᴏᴡ ʏᴏᴜ ᴄᴀɴ ᴜsᴇ ᴛʜᴇ ʙᴏᴛ\n"
             "📱 ᴊᴜsᴛ sᴇɴᴅ ᴍᴇ ᴀ ᴘʜᴏɴᴇ ɴᴜᴍʙᴇʀ!\n\n"
             "💡 ᴇxᴀᴍᴘʟᴇ: 9876543210"
         ),
+        "daily_limit": (
+            "🚫 ᴅᴀɪʟʏ ʟɪᴍɪᴛ ᴏꜰ {limit} ǫᴜᴇʀɪᴇs ʀᴇᴀᴄʜᴇᴅ\n\n"
+            "🔄 ᴘʟᴇᴀsᴇ ᴛʀʏ ᴀɢᴀɪɴ ᴛᴏᴍᴏʀʀᴏᴡ"
+        ),
+        "minute_limit": (
+            "⏳ ᴛᴏᴏ ᴍᴀɴʏ ʀᴇǫᴜᴇsᴛs\n\n"
+            "🔄 ᴘʟᴇᴀsᴇ ᴛʀʏ ᴀɢᴀɪɴ ɪɴ {seconds}s"
+        ),
         "invalid_format": (
             "📱 ᴘʟᴇᴀsᴇ sᴇɴᴅ ᴀ ᴠᴀʟɪᴅ ᴘʜᴏɴᴇ ɴᴜᴍʙᴇʀ\n\n"
             "📝 ꜰᴏʀᴍᴀᴛ: 98xxxxxxxx\n"
             "💡 ᴇxᴀᴍᴘʟᴇ: `9876543210`"
         ),
-        "processing": "🔍 ꜰᴇᴛᴄʜɪɴɢ ᴅᴇᴛᴀɪʟs... ⏳",
+        "invalid_number": (
+            "❌ ɪɴᴠᴀʟɪᴅ ɴᴜᴍʙᴇʀ ꜰᴏʀᴍᴀᴛ\n\n"
+            "🔍 ᴇʀʀᴏʀ: {error}\n\n"
+            "📝 ᴄᴏʀʀᴇᴄᴛ ꜰᴏʀᴍᴀᴛ:\n"
+            "• 9876543210\n"
+            "• +919876543210\n\n"
+            "📱 ᴘʟᴇᴀsᴇ sᴇɴᴅ ᴀ ᴠᴀʟɪᴅ ɪɴᴅɪᴀɴ ᴘʜᴏɴᴇ ɴᴜᴍʙᴇʀ"
+        ),
+        "processing": "🔍 ꜰᴇᴛᴄʜɪɴɡ ᴅᴇᴛᴀɪʟs... ⏳",
         "error": (
-            "❌ ᴇʀʀᴏʀ ꜰᴇᴛᴄʜɪɴɢ ᴅᴇᴛᴀɪʟs\n\n"
+            "❌ ᴇʀʀᴏʀ ꜰᴇᴛᴄʜɪɴɡ ᴅᴇᴛᴀɪʟs\n\n"
             "🔄 ᴘʟᴇᴀsᴇ ᴛʀʏ ᴀɢᴀɪɴ ʟᴀᴛᴇʀ"
         ),
+        "keys_exhausted": (
+            "❌ ᴀʟʟ ᴀᴘɪ ᴋᴇʏs ᴇxʜᴀᴜsᴛᴇᴅ ᴏʀ ʟɪᴍɪᴛ ᴇxᴄᴇᴇᴅᴇᴅ.\n\n"
+            "🔑 ᴘʟᴇᴀsᴇ ᴀᴅᴅ ɴᴇᴡ ᴋᴇʏs ᴏʀ ᴄᴏɴᴛᴀᴄᴛ ᴏᴡɴᴇʀ."
+        ),
         "unauthorized": "❌ ʏᴏᴜ ᴀʀᴇ ᴜɴᴀᴜᴛʜᴏʀɪᴢᴇᴅ",
         "broadcast_usage": "📢 ᴜsᴀɢᴇ: /broadcast <ᴍᴇssᴀɢᴇ>",
         "broadcast_start": "📤 sᴛᴀʀᴛɪɴɢ ʙʀᴏᴀᴅᴄᴀsᴛ...",
-        "data_export": "📊 ʙᴏᴛ ᴅᴀᴛᴀ ᴇxᴘᴏʀᴛ"
+        "export_starting": "📊 sᴛᴀʀᴛɪɴɢ ᴇxᴘᴏʀᴛ...",
+        "export_queued": "📊 <b>ᴇxᴘᴏʀᴛ</b> <code>{job_id}</code>: ǫᴜᴇᴜᴇᴅ\n🛑 /cancelexport {job_id}",
+        "export_running": "❌ <b>ᴇxᴘᴏʀᴛ</b> <code>{job_id}</code> ɪs ᴀʟʀᴇᴀᴅʏ ʀᴜɴɴɪɴɢ\n🛑 /cancelexport {job_id}",
+        "cancelexport_usage": "🛑 ᴜsᴀɢᴇ: /cancelexport <ᴊᴏʙ_ɪᴅ>",
+        "export_cancelling": "🛑 ᴄᴀɴᴄᴇʟʟɪɴɢ ᴇxᴘᴏʀᴛ...",
+        "export_not_found": "❌ ɴᴏ sᴜᴄʜ ʀᴜɴɴɪɴɢ ᴇxᴘᴏʀᴛ",
+        "indexes_error": "❌ ᴇʀʀᴏʀ ʀᴇᴀᴅɪɴɢ ɪɴᴅᴇxᴇs: {error}",
+        "addkey_usage": "🔑 ᴜsᴀɢᴇ: /addkey <ᴋᴇʏ>",
+        "key_already_loaded": "⚠️ ᴋᴇʏ ᴀʟʀᴇᴀᴅʏ ʟᴏᴀᴅᴇᴅ",
+        "key_added": "✅ ᴋᴇʏ `{key}` ᴀᴅᴅᴇᴅ",
+        "key_enabled": "✅ ᴋᴇʏ `{key}` ᴇɴᴀʙʟᴇᴅ",
+        "key_disabled": "⛔ ᴋᴇʏ `{key}` ᴅɪsᴀʙʟᴇᴅ",
+        "keys_title": "🔑 **ᴀᴘɪ ᴋᴇʏs**\n",
+        "keys_line": "{index}. `{key}`: {state}, `{remaining}/{quota}` ʟᴇꜰᴛ",
+        "keys_empty": "ɴᴏ ᴋᴇʏs ʟᴏᴀᴅᴇᴅ",
+        "keys_footer": "\n/addkey <ᴋᴇʏ> • /disablekey <ɴᴏ> • /enablekey <ɴᴏ>",
+        "unknown_key": "❌ ᴜɴᴋɴᴏᴡɴ ᴋᴇʏ, sᴇᴇ /keys ꜰᴏʀ ɴᴜᴍʙᴇʀs"
     }
     
     # Button Labels
@@ -107,7 +264,11 @@ class BotConfig:
     DB_COLLECTIONS = {
         "users": "users",
         "queries": "queries", 
-        "stats": "stats"
+        "stats": "stats",
+        "cache": "lookup_cache",
+        "broadcasts": "broadcasts",
+        "rate_limits": "rate_limits",
+        "api_keys": "api_keys"
     }
     
     @classmethod
@@ -121,7 +282,15 @@ class BotConfig:
         for field in required_fields:
             value = getattr(cls, field)
             if not value or (isinstance(value, str) and "YOUR_" in value):
-                print(f"❌ Please configure {field} in config.py")
+                logger.error(f"Please configure {field} in config.py")
+                return False
+        if cls.WEBHOOK_ENABLED:
+            for field in ("WEBHOOK_URL", "WEBHOOK_SECRET"):
+                if not getattr(cls, field):
+                    logger.error(f"Please configure {field} for webhook mode")
+                    return False
+            if not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", cls.WEBHOOK_SECRET):
+                logger.error("WEBHOOK_SECRET must be 1-256 characters of A-Z, a-z, 0-9, _ and -")
                 return False
         return True
     
@@ -152,17 +321,20 @@ class APIKeysManager:
     def __init__(self, keys_file: str = "access_keys.txt"):
         self.keys_file = keys_file
         self.keys = []
-        self.current_index = 0
+        self.mtime = None
         self.load_keys()
     
     def load_keys(self) -> None:
-        """Load API keys from file"""
+        """Load API keys from file (blank lines and # comments are skipped)"""
         try:
+            self.mtime = self.file_mtime()
             with open(self.keys_file, 'r') as f:
-                self.keys = [line.strip() for line in f.readlines() if line.strip()]
-            print(f"✅ Loaded {len(self.keys)} API keys")
+                keys = [line.strip() for line in f.readlines()]
+            # Replace the list in one assignment so readers never see a partial load
+            self.keys = [key for key in keys if key and not key.startswith('#')]
+            logger.info(f"Loaded {len(self.keys)} API keys")
         except FileNotFoundError:
-            print(f"❌ {self.keys_file} not found. Creating example file...")
+            logger.warning(f"{self.keys_file} not found. Creating example file...")
             self.create_example_file()
     
     def create_example_file(self) -> None:
@@ -175,42 +347,37 @@ your_third_access_key_here
 """
         with open(self.keys_file, 'w') as f:
             f.write(example_content)
-        print(f"📝 Created {self.keys_file} with example keys")
+        logger.warning(f"Created {self.keys_file} with example keys")
     
-    def get_next_key(self) -> str:
-        """Get next API key in rotation"""
-        if not self.keys:
-            return None
-        key = self.keys[self.current_index]
-        self.current_index = (self.current_index + 1) % len(self.keys)
-        return key
+    def reload_keys(self) -> None:
+        """Reload keys from file"""
+        self.load_keys()
+        logger.info("API keys reloaded")
     
-    def get_current_key(self) -> str:
-        """Get current API key without rotation"""
-        if not self.keys:
+    def file_mtime(self):
+        """Modification time of the keys file, or None if it is missing"""
+        try:
+            return os.stat(self.keys_file).st_mtime
+        except FileNotFoundError:
             return None
-        return self.keys[self.current_index]
     
-    def reload_keys(self) -> None:
-        """Reload keys from file"""
+    def has_changed(self) -> bool:
+        """True if the keys file was modified since it was last loaded"""
+        return self.file_mtime() != self.mtime
+    
+    def add_key(self, key: str) -> None:
+        """Append a key to the file and reload"""
+        with open(self.keys_file, 'a+') as f:
+            f.seek(0)
+            content = f.read()
+            if content and not content.endswith('\n'):
+                f.write('\n')
+            f.write(f"{key}\n")
         self.load_keys()
-        self.current_index = 0
-        print("🔄 API keys reloaded")
 
-# Text Styling Utility
+# Text Styling Utility (kept for imports; the engine lives in styling.py)
 class TextStyler:
-    @staticmethod
-    def stylize(text: str) -> str:
-        """Convert text to stylized small caps Unicode"""
-        normal = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
-        small_caps = "ᴀʙᴄᴅᴇꜰɢʜɪᴊᴋʟᴍɴᴏᴘǫʀꜱᴛᴜᴠᴡxʏᴢᴀʙᴄᴅᴇꜰɢʜɪᴊᴋʟᴍɴᴏᴘǫʀꜱᴛᴜᴠᴡxʏᴢ"
-        result = ""
-        for char in text:
-            if char in normal:
-                result += small_caps[normal.index(char)]
-            else:
-                result += char
-        return result
+    stylize = staticmethod(stylize)
 
 # Phone Number Utilities
 class PhoneUtils:
@@ -0,0 +1,312 @@
+# export.py - Data export for /data: streaming writers and the background job runner
+
+import asyncio
+import csv
+import gzip
+import html
+import io
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+from pymongo import MongoClient
+from telegram import Bot
+from telegram.constants import ParseMode
+
+from config import BotConfig
+from logsetup import JsonFormatter
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("xlsx", "csv", "jsonl")
+COLLECTIONS = ("users", "queries")
+
+# Date field used for from:/to: filters
+DATE_FIELDS = {"users": "first_seen", "queries": "timestamp"}
+
+# Fixed CSV columns; anything nested is written as JSON
+CSV_COLUMNS = {
+    "users": ["user_id", "username", "name", "first_seen", "last_seen", "query_count", "blocked"],
+    "queries": ["user_id", "phone_number", "timestamp", "result"]
+}
+
+EXPORT_USAGE = (
+    "📊 ᴜsᴀɢᴇ: /data [xlsx|csv|jsonl] [users|queries|all] "
+    "[from:YYYY-MM-DD] [to:YYYY-MM-DD]"
+)
+
+
+def parse_export_args(args: List[str]) -> Dict:
+    """Parse /data arguments in any order; raises ValueError on bad input"""
+    params = {"format": "xlsx", "collections": list(COLLECTIONS), "from": None, "to": None}
+    for arg in args:
+        value = arg.lower()
+        if value in FORMATS:
+            params["format"] = value
+        elif value in COLLECTIONS:
+            params["collections"] = [value]
+        elif value == "all":
+            params["collections"] = list(COLLECTIONS)
+        elif value.startswith(("from:", "to:")):
+            field, date = value.split(":", 1)
+            params[field] = datetime.strptime(date, "%Y-%m-%d")
+        else:
+            raise ValueError(f"Unknown argument: {arg}")
+    return params
+
+
+def build_query(collection: str, params: Dict) -> Dict:
+    """Mongo filter for the requested date range (to: is inclusive)"""
+    date_range = {}
+    if params["from"]:
+        date_range["$gte"] = params["from"]
+    if params["to"]:
+        date_range["$lt"] = params["to"] + timedelta(days=1)
+    return {DATE_FIELDS[collection]: date_range} if date_range else {}
+
+
+class PartWriter:
+    """Gzipped text output split into parts of at most `max_bytes` compressed"""
+
+    def __init__(self, out_dir: str, basename: str, extension: str, max_bytes: int, header: str = ""):
+        self.out_dir = out_dir
+        self.basename = basename
+        self.extension = extension
+        self.max_bytes = max_bytes
+        self.header = header
+        self.paths: List[str] = []
+        self.raw = None
+        self.gzip = None
+
+    def _open_part(self) -> None:
+        self.close()
+        path = os.path.join(self.out_dir, f"{self.basename}_part{len(self.paths) + 1}.{self.extension}.gz")
+        self.paths.append(path)
+        self.raw = open(path, "wb")
+        self.gzip = gzip.GzipFile(fileobj=self.raw, mode="wb")
+        if self.header:
+            self.gzip.write(self.header.encode("utf-8"))
+
+    def write(self, text: str) -> None:
+        # raw.tell() lags the gzip buffer slightly, max_bytes leaves headroom for it
+        if self.gzip is None or self.raw.tell() >= self.max_bytes:
+            self._open_part()
+        self.gzip.write(text.encode("utf-8"))
+
+    def close(self) -> None:
+        if self.gzip is not None:
+            self.gzip.close()
+            self.raw.close()
+            self.gzip = self.raw = None
+
+
+def _csv_line(values: List) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_export(mongo_uri: str, params: Dict, out_dir: str,
+                  on_progress: Optional[Callable[[str, int], None]] = None) -> List[str]:
+    """Export collections straight from Mongo cursors to gzipped parts in out_dir.
+
+    Memory use is constant: one cursor batch and one gzip buffer at a time.
+    Blocking; run it off the event loop.
+    """
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    paths = []
+    with MongoClient(mongo_uri) as client:
+        db = client['truecaller_bot']
+        for name in params["collections"]:
+            columns = CSV_COLUMNS[name]
+            header = _csv_line(columns) if params["format"] == "csv" else ""
+            writer = PartWriter(out_dir, f"{name}_{stamp}", params["format"], BotConfig.EXPORT_PART_BYTES, header)
+            cursor = db[BotConfig.DB_COLLECTIONS[name]].find(
+                build_query(name, params), {"_id": False}
+            ).batch_size(1000)
+            count = 0
+            try:
+                for doc in cursor:
+                    if params["format"] == "csv":
+                        writer.write(_csv_line([_csv_value(doc.get(column)) for column in columns]))
+                    else:
+                        writer.write(json.dumps(doc, default=str, ensure_ascii=False) + "\n")
+                    count += 1
+                    if on_progress and count % 5000 == 0:
+                        on_progress(name, count)
+                if count == 0:
+                    writer.write("")  # still produce an (empty) file
+            finally:
+                writer.close()
+            if on_progress:
+                on_progress(name, count)
+            paths.extend(writer.paths)
+    return paths
+
+
+def xlsx_export(mongo_uri: str, params: Dict, out_dir: str,
+                on_progress: Optional[Callable[[str, int], None]] = None) -> List[str]:
+    """Export to a single Excel workbook (loads everything, fine for small collections)"""
+    path = os.path.join(out_dir, f"bot_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+    with MongoClient(mongo_uri) as client:
+        db = client['truecaller_bot']
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            for name in params["collections"]:
+                docs = []
+                for doc in db[BotConfig.DB_COLLECTIONS[name]].find(build_query(name, params)).batch_size(1000):
+                    docs.append(doc)
+                    if on_progress and len(docs) % 5000 == 0:
+                        on_progress(name, len(docs))
+                if on_progress:
+                    on_progress(name, len(docs))
+                pd.DataFrame(docs).to_excel(writer, sheet_name=name.capitalize(), index=False)
+    return [path]
+
+
+def init_worker_logging() -> None:
+    """Worker process initializer: log straight to stderr.
+
+    A forked worker inherits the parent's QueueHandler but not the
+    listener thread that drains it, so its records would pile up unseen.
+    """
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if BotConfig.LOG_JSON else logging.Formatter(BotConfig.LOG_FORMAT))
+    logging.getLogger().handlers[:] = [handler]
+
+
+class ExportCancelled(Exception):
+    """Raised inside the worker when the owner cancels an export"""
+
+
+def run_export_job(mongo_uri: str, params: Dict, out_dir: str, progress, cancel_event) -> List[str]:
+    """Worker process entry point; reports progress and checks for cancellation"""
+    def on_progress(name: str, count: int) -> None:
+        if cancel_event.is_set():
+            raise ExportCancelled()
+        progress[name] = count
+
+    if params["format"] == "xlsx":
+        return xlsx_export(mongo_uri, params, out_dir, on_progress)
+    return stream_export(mongo_uri, params, out_dir, on_progress)
+
+
+class ExportJob:
+    """One export run; progress and cancel flag are shared with the worker process"""
+
+    def __init__(self, job_id: str, params: Dict, chat_id: int, message_id: int, manager):
+        self.job_id = job_id
+        self.params = params
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.progress = manager.dict()
+        self.cancel_event = manager.Event()
+
+
+class ExportJobRunner:
+    """Runs exports in a worker process, at most one at a time.
+
+    The handler returns as soon as the job is queued; the job edits its
+    progress message while it runs and uploads the result when done.
+    """
+
+    def __init__(self, progress_interval: float = 5):
+        self.progress_interval = progress_interval
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.manager = None
+        self.current: Optional[ExportJob] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, bot: Bot, params: Dict, chat_id: int, message_id: int) -> str:
+        """Start an export job and return its id; raises RuntimeError if one is running"""
+        if self.current is not None:
+            raise RuntimeError(f"Export {self.current.job_id} is already running")
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=1, initializer=init_worker_logging)
+            self.manager = multiprocessing.Manager()
+        job = ExportJob(uuid.uuid4().hex[:8], params, chat_id, message_id, self.manager)
+        self.current = job
+        self.task = asyncio.create_task(self._run(bot, job))
+        return job.job_id
+
+    def cancel(self, job_id: str) -> bool:
+        if self.current is None or self.current.job_id != job_id:
+            return False
+        self.current.cancel_event.set()
+        return True
+
+    async def shutdown(self) -> None:
+        if self.current is not None:
+            self.current.cancel_event.set()
+        if self.task is not None:
+            await asyncio.gather(self.task, return_exceptions=True)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.manager.shutdown()
+            self.executor = self.manager = None
+
+    async def _run(self, bot: Bot, job: ExportJob) -> None:
+        out_dir = tempfile.mkdtemp(prefix=f"export_{job.job_id}_")
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, run_export_job,
+                BotConfig.MONGO_URI, job.params, out_dir, job.progress, job.cancel_event
+            )
+            while not future.done():
+                await asyncio.wait({future}, timeout=self.progress_interval)
+                if not future.done():
+                    await self._edit(bot, job, "⏳ ʀᴜɴɴɪɴɢ")
+
+            paths = future.result()
+            for index, path in enumerate(paths, 1):
+                with open(path, "rb") as document:
+                    await bot.send_document(
+                        chat_id=job.chat_id,
+                        document=document,
+                        filename=os.path.basename(path),
+                        caption=f"📊 ʙᴏᴛ ᴅᴀᴛᴀ ᴇxᴘᴏʀᴛ ({index}/{len(paths)})"
+                    )
+            await self._edit(bot, job, "✅ ᴅᴏɴᴇ")
+        except ExportCancelled:
+            await self._edit(bot, job, "🛑 ᴄᴀɴᴄᴇʟʟᴇᴅ")
+        except Exception as e:
+            logger.error(f"Export {job.job_id} failed: {e}")
+            await self._edit(bot, job, f"❌ ꜰᴀɪʟᴇᴅ: {html.escape(str(e))}")
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+            self.current = None
+
+    async def _edit(self, bot: Bot, job: ExportJob, status: str) -> None:
+        try:
+            progress = dict(job.progress)
+        except Exception:
+            progress = {}  # manager already gone during shutdown
+        lines = [f"📊 <b>ᴇxᴘᴏʀᴛ</b> <code>{job.job_id}</code>: {status}"]
+        for name in job.params["collections"]:
+            lines.append(f"• {name}: {progress.get(name, 0)} ʀᴏᴡs")
+        try:
+            await bot.edit_message_text(
+                "\n".join(lines),
+                chat_id=job.chat_id,
+                message_id=job.message_id,
+                parse_mode=ParseMode.HTML
+            )
+        except Exception as e:
+            if "Message is not modified" not in str(e):
+                logger.error(f"Export progress edit error: {e}")
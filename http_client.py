@@ -0,0 +1,83 @@
+# http_client.py - Shared async HTTP client for upstream lookups
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class PooledHTTPClient:
+    """Connection-pooled, keep-alive HTTP client shared by all fetchers"""
+
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20,
+                 keepalive_expiry: float = 30.0, per_host_limit: int = 10,
+                 timeout: float = 10.0):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+        self.host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def start(self) -> None:
+        """Create the underlying client (call once at startup)"""
+        if self.client is None:
+            self.client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            logger.info("HTTP client started")
+
+    async def close(self) -> None:
+        """Close all pooled connections (call once on shutdown)"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            logger.info("HTTP client closed")
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = httpx.URL(url).host
+        semaphore = self.host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self.host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return semaphore
+
+    async def get(self, url: str, params: Dict = None, timeout: float = None,
+                  hedge_after: Optional[float] = None) -> httpx.Response:
+        """GET a URL, capping concurrent connections per upstream host.
+
+        With `hedge_after`, a second identical request is sent if the first
+        has not answered after that many seconds; the first response wins.
+        """
+        if self.client is None:
+            await self.start()
+        if hedge_after is None:
+            return await self._get(url, params, timeout)
+
+        first = asyncio.create_task(self._get(url, params, timeout))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                tasks.add(asyncio.create_task(self._get(url, params, timeout)))
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both failed, report the original request's error
+            return first.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _get(self, url: str, params: Dict = None, timeout: float = None) -> httpx.Response:
+        async with self._host_semaphore(url):
+            return await self.client.get(
+                url,
+                params=params,
+                timeout=timeout if timeout is not None else self.timeout
+            )
@@ -0,0 +1,158 @@
+# keypool.py - Quota-aware pool of validation API keys
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from pymongo import UpdateOne
+
+from stats import mask_key
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "active"
+EXHAUSTED = "exhausted"
+INVALID = "invalid"
+DISABLED = "disabled"
+
+
+def next_month_start(now: datetime) -> datetime:
+    if now.month == 12:
+        return datetime(now.year + 1, 1, 1)
+    return datetime(now.year, now.month + 1, 1)
+
+
+class KeyPool:
+    """Tracks state and monthly usage of every API key.
+
+    A key is active, exhausted until its quota resets at the start of next
+    month, invalid, or disabled by the owner. acquire() always hands out the
+    healthy key with the most quota left, so dead keys are never retried.
+    """
+
+    def __init__(self, keys: Iterable[str], monthly_quota: int):
+        self.monthly_quota = monthly_quota
+        self.month = datetime.now().strftime("%Y-%m")
+        self.keys: Dict[str, Dict] = {key: self._new_record() for key in keys}
+        # Keys changed since the last persist
+        self.dirty: Set[str] = set()
+
+    def _new_record(self) -> Dict:
+        return {"state": ACTIVE, "used": 0, "month": self.month, "reset_at": None}
+
+    def _roll_month(self) -> None:
+        now = datetime.now()
+        month = now.strftime("%Y-%m")
+        if month != self.month:
+            self.month = month
+            for key, record in self.keys.items():
+                record["used"] = 0
+                record["month"] = month
+                self.dirty.add(key)
+        for key, record in self.keys.items():
+            if record["state"] == EXHAUSTED and record["reset_at"] and record["reset_at"] <= now:
+                record["state"] = ACTIVE
+                record["reset_at"] = None
+                self.dirty.add(key)
+
+    def sync_keys(self, keys: Iterable[str]) -> List[str]:
+        """Swap in a new key list, keeping state of known keys; returns the added keys.
+
+        The dict is replaced in one assignment, so in-flight lookups holding
+        a removed key finish normally (updates for it are ignored).
+        """
+        keys = list(dict.fromkeys(keys))
+        added = [key for key in keys if key not in self.keys]
+        self.keys = {key: self.keys.get(key) or self._new_record() for key in keys}
+        return added
+
+    def remaining(self, key: str) -> int:
+        return max(0, self.monthly_quota - self.keys[key]["used"])
+
+    def acquire(self, exclude: Set[str] = frozenset()) -> Optional[str]:
+        """Healthy key with the most quota left, or None if none is usable"""
+        self._roll_month()
+        candidates = [
+            key for key, record in self.keys.items()
+            if record["state"] == ACTIVE and key not in exclude
+        ]
+        if not candidates:
+            return None
+        return max(candidates, key=self.remaining)
+
+    def healthy_count(self) -> int:
+        self._roll_month()
+        return sum(1 for record in self.keys.values() if record["state"] == ACTIVE)
+
+    def record_use(self, key: str) -> None:
+        record = self.keys.get(key)
+        if record is not None:
+            record["used"] += 1
+            self.dirty.add(key)
+
+    def _set_state(self, key: str, state: str) -> Optional[Dict]:
+        record = self.keys.get(key)
+        if record is not None:
+            record["state"] = state
+            record["reset_at"] = None
+            self.dirty.add(key)
+        return record
+
+    def mark_exhausted(self, key: str) -> None:
+        record = self._set_state(key, EXHAUSTED)
+        if record is None:
+            return
+        record["reset_at"] = next_month_start(datetime.now())
+        # The provider says we're out, trust it over our own count
+        record["used"] = max(record["used"], self.monthly_quota)
+        logger.warning(f"API key {mask_key(key)} exhausted until {record['reset_at']:%Y-%m-%d}")
+
+    def mark_invalid(self, key: str) -> None:
+        if self._set_state(key, INVALID) is not None:
+            logger.warning(f"API key {mask_key(key)} marked invalid")
+
+    def disable(self, key: str) -> bool:
+        return self._set_state(key, DISABLED) is not None
+
+    def enable(self, key: str) -> bool:
+        return self._set_state(key, ACTIVE) is not None
+
+    def summary(self) -> List[Dict]:
+        """Display-safe state of every key, in file order"""
+        self._roll_month()
+        return [
+            {
+                "key": mask_key(key),
+                "state": record["state"],
+                "remaining": self.remaining(key),
+                "reset_at": record["reset_at"]
+            }
+            for key, record in self.keys.items()
+        ]
+
+    async def load(self, collection, keys: Iterable[str] = None) -> None:
+        """Restore persisted state for the given keys (all keys by default)"""
+        keys = list(self.keys) if keys is None else list(keys)
+        async for doc in collection.find({"_id": {"$in": keys}}):
+            record = self.keys.get(doc["_id"])
+            if record is None:
+                continue
+            record["state"] = doc.get("state", ACTIVE)
+            record["reset_at"] = doc.get("reset_at")
+            if doc.get("month") == self.month:
+                record["used"] = doc.get("used", 0)
+        self._roll_month()
+
+    async def persist(self, collection) -> None:
+        dirty, self.dirty = self.dirty, set()
+        operations = [
+            UpdateOne({"_id": key}, {"$set": dict(self.keys[key])}, upsert=True)
+            for key in dirty if key in self.keys
+        ]
+        if not operations:
+            return
+        try:
+            await collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Key pool persist error: {e}")
+            self.dirty |= dirty
@@ -0,0 +1,50 @@
+# latency.py - Rolling upstream latency percentiles and the timeouts derived from them
+
+import random
+from collections import deque
+from typing import Dict, List, Optional
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class LatencyTracker:
+    """Latency of the last `window` successful calls to one provider.
+
+    Percentiles are None until `min_samples` calls have been seen, so
+    callers fall back to their static defaults on a cold start.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._sorted: Optional[List[float]] = None
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._sorted = None
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        index = min(len(self._sorted) - 1, int(len(self._sorted) * p / 100))
+        return self._sorted[index]
+
+    def timeout(self, default: float, floor: float, multiplier: float) -> float:
+        """`multiplier` x p99, clamped to [floor, default]; default until warmed up"""
+        p99 = self.percentile(99)
+        if p99 is None:
+            return default
+        return max(floor, min(default, p99 * multiplier))
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        return {
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "samples": len(self.samples)
+        }
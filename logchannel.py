@@ -0,0 +1,115 @@
+# logchannel.py - Batched, coalescing background queue for log channel messages
+
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+from telegram import Bot
+from telegram.constants import ParseMode
+from telegram.error import RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Telegram's limit is 4096 characters per message, leave room for the summary lines
+MAX_MESSAGE_CHARS = 3800
+
+
+class LogChannel:
+    """Posts log channel events from a background task, never from the request path.
+
+    post() only buffers the event. Buffered events are sent as one combined
+    HTML message every `flush_interval` seconds or as soon as `batch_size`
+    are waiting. Events posted with the same key are merged into one line
+    with a repeat count. Once `max_pending` events are buffered, new ones are
+    dropped and the next message reports how many were lost.
+    """
+
+    def __init__(self, chat_id: int, batch_size: int = 20, flush_interval: float = 5,
+                 max_pending: int = 500):
+        self.chat_id = chat_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # key -> [html text, repeat count]
+        self.pending: "OrderedDict[Hashable, list]" = OrderedDict()
+        self.dropped = 0
+        self.unique_keys = itertools.count()
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def post(self, text: str, key: Hashable = None) -> None:
+        """Queue an HTML event; events sharing a key are coalesced"""
+        if not self.chat_id:
+            return
+        if key is None:
+            key = ("event", next(self.unique_keys))
+        entry = self.pending.get(key)
+        if entry is not None:
+            entry[1] += 1
+        elif len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        else:
+            self.pending[key] = [text, 1]
+        if len(self.pending) >= self.batch_size and self.wakeup is not None:
+            self.wakeup.set()
+
+    def start(self, bot: Bot) -> None:
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._run(bot))
+
+    async def stop(self, bot: Bot) -> None:
+        """Stop the sender and flush what is left (call while the bot can still send)"""
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        while self.pending or self.dropped:
+            if not await self._flush(bot, retry=False):
+                break
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            if self.pending or self.dropped:
+                await self._flush(bot)
+
+    def _take_batch(self) -> List[str]:
+        lines, size = [], 0
+        while self.pending and len(lines) < self.batch_size:
+            key, (text, count) = next(iter(self.pending.items()))
+            line = f"{text}\n<i>×{count}</i>" if count > 1 else text
+            if lines and size + len(line) > MAX_MESSAGE_CHARS:
+                break
+            del self.pending[key]
+            lines.append(line[:MAX_MESSAGE_CHARS])
+            size += len(line) + 2
+        return lines
+
+    async def _flush(self, bot: Bot, retry: bool = True) -> bool:
+        """Send one combined message; returns False if it could not be sent"""
+        lines = self._take_batch()
+        # Drops during a RetryAfter wait below are left for the next message
+        reported = self.dropped
+        if reported:
+            lines.append(f"⚠️ {reported} log events dropped (queue full)")
+        text = "\n\n".join(lines)
+        while True:
+            try:
+                await bot.send_message(chat_id=self.chat_id, text=text, parse_mode=ParseMode.HTML)
+                self.dropped -= reported
+                return True
+            except RetryAfter as e:
+                if not retry:
+                    return False
+                # Hold the batch; new events keep buffering (or dropping) meanwhile
+                await asyncio.sleep(e.retry_after)
+            except TelegramError as e:
+                logger.error(f"Log channel error: {e}")
+                return False
@@ -0,0 +1,111 @@
+# logsetup.py - Queue-based logging so handlers never block on stream writes
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from typing import Dict, List, Optional
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message (and exception)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock prepare() formats the record (message, arguments and
+    traceback) on the logging thread and drops exc_info. With an
+    in-process queue the record can be passed on as it is.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: int, fmt: str, json_lines: bool = False,
+                  filters: Optional[List[logging.Filter]] = None) -> logging.handlers.QueueListener:
+    """Route all records through a queue to a stderr writer thread.
+
+    The event loop only pays for building the record and a queue put;
+    `filters`, message interpolation, tracebacks and the write happen on
+    the listener thread.
+    """
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if json_lines else logging.Formatter(fmt))
+    for log_filter in filters or []:
+        stream.addFilter(log_filter)
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [DeferredQueueHandler(records)]
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class Truncated:
+    """Log argument rendered lazily and cut to `limit` characters.
+
+    `value` may be a callable, so an expensive payload (e.g. a response
+    body) is only produced if the record is actually emitted.
+    """
+
+    def __init__(self, value, limit: int = 300):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = str(self.value() if callable(self.value) else self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}... ({len(text)} chars)"
+
+
+class ThrottledLogger:
+    """Emits at most one record per key every `interval` seconds.
+
+    For hot paths: a disabled level costs one isEnabledFor check, and
+    repeats inside the interval are only counted and reported with the
+    next record for that key.
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float = 10.0):
+        self.logger = logger
+        self.interval = interval
+        # key -> [last emitted at, suppressed since]
+        self.state: Dict[str, list] = {}
+
+    def log(self, level: int, key: str, msg: str, *args) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        state = self.state.get(key)
+        if state is not None and now - state[0] < self.interval:
+            state[1] += 1
+            return
+        suppressed = state[1] if state is not None else 0
+        self.state[key] = [now, 0]
+        if suppressed:
+            msg = f"{msg} (+{suppressed} similar suppressed)"
+        self.logger.log(level, msg, *args)
+
+    def debug(self, key: str, msg: str, *args) -> None:
+        self.log(logging.DEBUG, key, msg, *args)
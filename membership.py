@@ -0,0 +1,155 @@
+# membership.py - Force-subscription membership state
+
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+
+logger = logging.getLogger(__name__)
+
+
+class MembershipCache:
+    """Per-(user, channel) membership status with a TTL.
+
+    Entries are also written by chat member updates, so joins and leaves
+    show up without waiting for the TTL to expire.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # (user_id, channel_id) -> (is_member, expires_at)
+        self.entries: Dict[Tuple[int, str], Tuple[bool, float]] = {}
+
+    def get(self, user_id: int, channel_id: str) -> Optional[bool]:
+        """Cached membership, or None if unknown or expired"""
+        entry = self.entries.get((user_id, str(channel_id)))
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def set(self, user_id: int, channel_id: str, is_member: bool) -> None:
+        if len(self.entries) >= self.max_entries:
+            self.prune()
+        self.entries[(user_id, str(channel_id))] = (is_member, time.monotonic() + self.ttl)
+
+    def invalidate_channel(self, channel_id: str) -> None:
+        """Forget every cached answer for one channel"""
+        channel_id = str(channel_id)
+        for key in [key for key in self.entries if key[1] == channel_id]:
+            del self.entries[key]
+
+    def prune(self) -> None:
+        """Drop expired entries, or everything if none have expired yet"""
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at) in self.entries.items() if expires_at <= now]
+        if not expired:
+            self.entries.clear()
+        for key in expired:
+            del self.entries[key]
+
+
+class JoinRequestIndex:
+    """Pending join requesters per channel for O(1) membership checks.
+
+    Filled by a full userbot resync and kept current by join request and
+    chat member updates in between.
+    """
+
+    def __init__(self):
+        self.pending: Dict[str, Set[int]] = {}
+
+    def has(self, user_id: int, channel_id: str) -> bool:
+        return user_id in self.pending.get(str(channel_id), ())
+
+    def add(self, user_id: int, channel_id: str) -> None:
+        self.pending.setdefault(str(channel_id), set()).add(user_id)
+
+    def discard(self, user_id: int, channel_id: str) -> None:
+        self.pending.get(str(channel_id), set()).discard(user_id)
+
+    def replace(self, channel_id: str, user_ids: Iterable[int]) -> None:
+        """Swap in the result of a full resync"""
+        self.pending[str(channel_id)] = set(user_ids)
+
+
+class InviteLinkCache:
+    """Invite links for force-sub channels and the prebuilt join keyboard.
+
+    Links are resolved once at startup and re-checked on every refresh;
+    links we created are regenerated if they were revoked or deleted.
+    Channels that could not be resolved yet are listed by missing().
+    """
+
+    def __init__(self, channels: List[Dict]):
+        self.channels = channels
+        self.links: Dict[str, str] = {}
+        # Channels whose link we created ourselves (private channels)
+        self.created: Set[str] = set()
+        self.keyboard = self.build_keyboard()
+
+    def missing(self) -> List[str]:
+        """Channels that have no link yet"""
+        return [str(channel["id"]) for channel in self.channels if str(channel["id"]) not in self.links]
+
+    async def refresh(self, bot: Bot, channel_ids: Optional[Iterable[str]] = None) -> None:
+        """Resolve the links of `channel_ids` (default: every channel) and rebuild the keyboard"""
+        if channel_ids is None:
+            channel_ids = [str(channel["id"]) for channel in self.channels]
+        for channel_id in channel_ids:
+            try:
+                self.links[channel_id] = await self._resolve(bot, channel_id)
+            except Exception as e:
+                # Keep serving the previous link if there is one
+                logger.error(f"Invite link error for {channel_id}: {e}")
+        self.keyboard = self.build_keyboard()
+
+    async def _resolve(self, bot: Bot, channel_id: str) -> str:
+        current = self.links.get(channel_id)
+        if current and channel_id in self.created:
+            try:
+                link = await bot.edit_chat_invite_link(channel_id, current, creates_join_request=True)
+                if not link.is_revoked:
+                    return current
+            except Exception:
+                pass  # link was deleted, create a new one below
+            logger.warning(f"Invite link for {channel_id} was revoked, regenerating")
+
+        chat = await bot.get_chat(channel_id)
+        if chat.username:
+            self.created.discard(channel_id)
+            return f"https://t.me/{chat.username}"
+        # For private channel, create join request link
+        invite = await bot.create_chat_invite_link(
+            chat_id=channel_id,
+            creates_join_request=True
+        )
+        self.created.add(channel_id)
+        return invite.invite_link
+
+    def build_keyboard(self) -> InlineKeyboardMarkup:
+        keyboard = []
+        for channel in self.channels:
+            url = self.links.get(str(channel["id"]))
+            if url:
+                keyboard.append([InlineKeyboardButton(
+                    f"📢 ᴊᴏɪɴ {channel['name']}",
+                    url=url
+                )])
+        keyboard.append([InlineKeyboardButton(
+            "✅ ᴄʜᴇᴄᴋ ᴍᴇᴍʙᴇʀsʜɪᴘ",
+            callback_data="check_membership"
+        )])
+        return InlineKeyboardMarkup(keyboard)
+
+
+def match_force_sub_channel(chat, channels: List[Dict]) -> Optional[str]:
+    """Return the configured force-sub channel id matching a Telegram chat"""
+    for channel in channels:
+        channel_id = str(channel["id"])
+        if channel_id == str(chat.id):
+            return channel_id
+        if chat.username and channel_id.lower() == f"@{chat.username}".lower():
+            return channel_id
+    return None
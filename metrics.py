@@ -0,0 +1,251 @@
+# metrics.py - In-process metrics and an optional Prometheus text-format endpoint
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Iterable[str], values: Iterable, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    # Updated from pymongo's executor threads too, hence the lock
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.values: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., sum, count]
+        self.values: Dict[tuple, List[float]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        with self.lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            values = [(labels, list(series)) for labels, series in self.values.items()]
+        for labels, series in values:
+            for bound, count in zip(self.buckets, series):
+                bound_label = _labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bound_label} {count}")
+            inf_label = _labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_label} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from `collect`, which returns {label values tuple: value}"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...],
+                 collect: Callable[[], Dict[tuple, float]]):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.error(f"Metrics gauge {self.name} error: {e}")
+            return lines
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name: str, help_text: str, labelnames: Tuple[str, ...],
+              collect: Callable[[], Dict[tuple, float]]) -> Gauge:
+        return self._add(Gauge(name, help_text, labelnames, collect))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.histogram(
+    "bot_handler_seconds", "Update handling time per handler", ("handler",)
+)
+HANDLER_ERRORS = REGISTRY.counter(
+    "bot_handler_errors_total", "Handler calls that raised", ("handler",)
+)
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "bot_upstream_seconds", "Upstream API request time per provider", ("provider",)
+)
+UPSTREAM_RESPONSES = REGISTRY.counter(
+    "bot_upstream_responses_total", "Upstream API responses by status ('error' for transport errors)",
+    ("provider", "status")
+)
+MONGO_LATENCY = REGISTRY.histogram(
+    "bot_mongo_command_seconds", "MongoDB command time", ("command",)
+)
+MONGO_ERRORS = REGISTRY.counter(
+    "bot_mongo_command_errors_total", "Failed MongoDB commands", ("command",)
+)
+TELEGRAM_CALLS = REGISTRY.counter(
+    "bot_telegram_api_calls_total", "Telegram Bot API calls by method and outcome", ("method", "outcome")
+)
+
+
+def instrument_handler(handler):
+    """Record a handler's latency and errors under its function name"""
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        started = time.monotonic()
+        try:
+            return await handler(*args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.monotonic() - started, name)
+    return wrapper
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """pymongo command monitoring, passed to the client as an event listener.
+
+    Called on motor's executor threads, not the event loop.
+    """
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event) -> None:
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, event.command_name)
+        MONGO_ERRORS.inc(event.command_name)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """Bot API transport that counts calls per method and outcome"""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        # Only the last path segment: the rest of the URL holds the bot token
+        api_method = url.rsplit("/", 1)[-1]
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            TELEGRAM_CALLS.inc(api_method, "error")
+            raise
+        TELEGRAM_CALLS.inc(api_method, "ok" if code < 400 else str(code))
+        return code, payload
+
+
+class MetricsServer:
+    """Minimal HTTP server answering GET /metrics with the registry's text format"""
+
+    def __init__(self, registry: Registry, host: str, port: int):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.warning(f"Metrics endpoint on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Drain headers; the request has no body we care about
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self.registry.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.error(f"Metrics request error: {e}")
+        finally:
+            writer.close()
@@ -0,0 +1,111 @@
+# ratelimit.py - Per-user rate limits (token bucket per minute, counter per day)
+
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+class UserRateLimiter:
+    """In-memory per-user limits, persisted periodically so restarts keep quotas.
+
+    Each user has a token bucket holding `per_minute` tokens that refills
+    continuously over a minute and is charged for every message, plus a
+    count of today's queries that is only charged for valid numbers.
+    """
+
+    def __init__(self, per_minute: int, per_day: int):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.refill_rate = per_minute / 60.0
+        # user_id -> [tokens, updated_at (unix time)]
+        self.buckets: Dict[int, List[float]] = {}
+        self.daily: Dict[int, int] = {}
+        self.date = datetime.now().strftime("%Y-%m-%d")
+        # Users changed since the last persist
+        self.dirty: Set[int] = set()
+
+    def _roll_day(self) -> None:
+        today = datetime.now().strftime("%Y-%m-%d")
+        if today != self.date:
+            self.date = today
+            self.daily.clear()
+
+    def _refill(self, user_id: int, now: float) -> List[float]:
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            bucket = self.buckets[user_id] = [float(self.per_minute), now]
+        else:
+            bucket[0] = min(self.per_minute, bucket[0] + (now - bucket[1]) * self.refill_rate)
+            bucket[1] = now
+        return bucket
+
+    def check(self, user_id: int) -> Tuple[bool, Optional[str], float]:
+        """Consume one message from the minute bucket; returns (allowed, limit_hit, retry_after_seconds).
+
+        Users who already used up today's queries are refused here too, but
+        today's count itself is only charged by count_query().
+        """
+        self._roll_day()
+        if self.daily.get(user_id, 0) >= self.per_day:
+            return False, "day", 0.0
+
+        now = time.time()
+        bucket = self._refill(user_id, now)
+        if bucket[0] < 1:
+            return False, "minute", (1 - bucket[0]) / self.refill_rate
+
+        bucket[0] -= 1
+        self.dirty.add(user_id)
+        return True, None, 0.0
+
+    def count_query(self, user_id: int) -> bool:
+        """Charge one query against today's limit; False if it is already used up"""
+        self._roll_day()
+        count = self.daily.get(user_id, 0)
+        if count >= self.per_day:
+            return False
+        self.daily[user_id] = count + 1
+        self.dirty.add(user_id)
+        return True
+
+    async def load(self, collection) -> None:
+        """Restore today's counters and buckets (call once at startup)"""
+        self._roll_day()
+        async for doc in collection.find({"date": self.date}):
+            user_id = doc["_id"]
+            self.daily[user_id] = doc.get("count", 0)
+            self.buckets[user_id] = [doc.get("tokens", float(self.per_minute)), doc.get("updated_at", time.time())]
+
+    async def persist(self, collection) -> None:
+        """Write changed users and forget buckets that have fully refilled"""
+        now = time.time()
+        dirty, self.dirty = self.dirty, set()
+        operations = []
+        for user_id in dirty:
+            tokens, updated_at = self.buckets.get(user_id, (float(self.per_minute), now))
+            operations.append(UpdateOne(
+                {"_id": user_id},
+                {"$set": {
+                    "date": self.date,
+                    "count": self.daily.get(user_id, 0),
+                    "tokens": tokens,
+                    "updated_at": updated_at
+                }},
+                upsert=True
+            ))
+        if operations:
+            try:
+                await collection.bulk_write(operations, ordered=False)
+            except Exception as e:
+                logger.error(f"Rate limit persist error: {e}")
+                self.dirty |= dirty
+                return
+
+        for user_id in [user_id for user_id in self.buckets if user_id not in self.dirty]:
+            if self._refill(user_id, now)[0] >= self.per_minute:
+                del self.buckets[user_id]
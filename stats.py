@@ -0,0 +1,104 @@
+# stats.py - In-process statistics counters with periodic Mongo checkpoints
+
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+def mask_key(key: str) -> str:
+    """Short, display-safe form of an API key"""
+    return f"{key[:4]}…{key[-4:]}" if len(key) > 8 else key
+
+
+class StatsAggregator:
+    """Live bot counters so /stats never has to scan a collection.
+
+    Counters are rebuilt from Mongo at startup and written back to the
+    day's stats document on every checkpoint.
+    """
+
+    def __init__(self):
+        self.total_users = 0
+        self.date = datetime.now().strftime("%Y-%m-%d")
+        self.new_users_today = 0
+        self.queries_today = 0
+        self.key_usage = Counter()
+        self.errors = Counter()
+        # Finished days not yet written to Mongo
+        self.unsaved_days: List[Dict] = []
+
+    async def rebuild(self, db) -> None:
+        """Load counters from Mongo (call once at startup)"""
+        self.date = datetime.now().strftime("%Y-%m-%d")
+        midnight = datetime.strptime(self.date, "%Y-%m-%d")
+        self.total_users = await db.count_users()
+        self.new_users_today = await db.users.count_documents({"first_seen": {"$gte": midnight}})
+        today = await db.get_daily_stats(self.date) or {}
+        self.queries_today = today.get("queries", 0)
+        self.key_usage = Counter(today.get("key_usage", {}))
+        self.errors = Counter(today.get("errors", {}))
+
+    def _roll_day(self) -> None:
+        today = datetime.now().strftime("%Y-%m-%d")
+        if today != self.date:
+            self.unsaved_days.append(self.snapshot())
+            self.date = today
+            self.new_users_today = 0
+            self.queries_today = 0
+            self.key_usage = Counter()
+            self.errors = Counter()
+
+    def record_user(self, is_new: bool) -> None:
+        if is_new:
+            self._roll_day()
+            self.total_users += 1
+            self.new_users_today += 1
+
+    def record_query(self) -> None:
+        self._roll_day()
+        self.queries_today += 1
+
+    def record_key_use(self, key: str) -> None:
+        self._roll_day()
+        self.key_usage[mask_key(key)] += 1
+
+    def record_error(self, source: str) -> None:
+        self._roll_day()
+        self.errors[source] += 1
+
+    def snapshot(self) -> Dict:
+        return {
+            "date": self.date,
+            "total_users": self.total_users,
+            "new_users": self.new_users_today,
+            "queries": self.queries_today,
+            "key_usage": dict(self.key_usage),
+            "errors": dict(self.errors)
+        }
+
+    async def checkpoint(self, db) -> None:
+        """Write finished days and today's counters to their daily stats documents"""
+        self._roll_day()
+        while self.unsaved_days:
+            if not await self._save(db, self.unsaved_days[0]):
+                return
+            self.unsaved_days.pop(0)
+        await self._save(db, self.snapshot())
+
+    @staticmethod
+    async def _save(db, snapshot: Dict) -> bool:
+        fields = dict(snapshot)
+        date = fields.pop("date")
+        try:
+            await db.stats.update_one(
+                {"type": "daily", "date": date},
+                {"$set": fields},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Stats checkpoint error for {date}: {e}")
+            return False
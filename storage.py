@@ -0,0 +1,202 @@
+# storage.py - Async MongoDB access layer for users, queries and stats
+
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from config import BotConfig
+
+logger = logging.getLogger(__name__)
+
+# (DB_COLLECTIONS key, index keys, index options) provisioned at startup
+INDEXES = [
+    ("users", [("user_id", ASCENDING)], {"name": "user_id_unique", "unique": True}),
+    ("stats", [("type", ASCENDING), ("date", ASCENDING)], {"name": "type_date_unique", "unique": True}),
+    ("queries", [("user_id", ASCENDING), ("timestamp", DESCENDING)], {"name": "user_id_timestamp"}),
+]
+
+
+class Database:
+    """Async persistence layer shared by all handlers (motor driver, pooled connections)"""
+
+    def __init__(self, uri: str, pool_size: int = 50, server_selection_timeout_ms: int = 5000,
+                 write_concern: Union[int, str] = 1, event_listeners: Optional[List] = None):
+        self.client = AsyncIOMotorClient(
+            uri,
+            maxPoolSize=pool_size,
+            serverSelectionTimeoutMS=server_selection_timeout_ms,
+            w=write_concern,
+            event_listeners=event_listeners or []
+        )
+        self.db = self.client['truecaller_bot']
+        self.users = self.db[BotConfig.DB_COLLECTIONS['users']]
+        self.queries = self.db[BotConfig.DB_COLLECTIONS['queries']]
+        self.stats = self.db[BotConfig.DB_COLLECTIONS['stats']]
+        # Batches save_query writes in the background
+        self.query_writer = QueryWriter(
+            self,
+            batch_size=BotConfig.WRITE_BATCH_SIZE,
+            flush_interval=BotConfig.WRITE_FLUSH_INTERVAL,
+            max_queue=BotConfig.WRITE_QUEUE_SIZE
+        )
+
+    def collection(self, name: str):
+        """Get a collection by its DB_COLLECTIONS key"""
+        return self.db[BotConfig.DB_COLLECTIONS[name]]
+
+    async def start(self) -> None:
+        await self.query_writer.start()
+
+    def queue_depth(self) -> int:
+        """Queries waiting in the write-behind buffer"""
+        return self.query_writer.queue.qsize() if self.query_writer.queue is not None else 0
+
+    async def close(self) -> None:
+        """Flush buffered writes, then close the client"""
+        await self.query_writer.close()
+        self.client.close()
+
+    async def ensure_indexes(self) -> None:
+        """Create the indexes the bot relies on (no-op for indexes that already exist)"""
+        for name, keys, options in INDEXES:
+            collection = self.collection(name)
+            try:
+                await collection.create_index(keys, **options)
+                logger.info(f"Index {options['name']} on {collection.name} ready")
+            except Exception as e:
+                # e.g. duplicate documents blocking a unique index
+                logger.error(f"Failed to build index {options['name']} on {collection.name}: {e}")
+
+    async def index_usage(self) -> Dict[str, List[Dict]]:
+        """Per-collection $indexStats (operation counts since the server last restarted)"""
+        usage = {}
+        for name in BotConfig.DB_COLLECTIONS:
+            collection = self.collection(name)
+            usage[collection.name] = await collection.aggregate([{"$indexStats": {}}]).to_list(length=None)
+        return usage
+
+    async def init_stats(self) -> None:
+        """Initialize statistics collection"""
+        if not await self.stats.find_one({"type": "daily"}):
+            await self.stats.insert_one({
+                "type": "daily",
+                "date": datetime.now().strftime("%Y-%m-%d"),
+                "queries": 0,
+                "users": 0
+            })
+
+    async def save_user(self, user_id: int, username: str = None, name: str = None) -> bool:
+        """Save user to database and return True if new user"""
+        user_data = {
+            "user_id": user_id,
+            "username": username,
+            "name": name,
+            "first_seen": datetime.now()
+        }
+        result = await self.users.update_one(
+            {"user_id": user_id},
+            {
+                "$setOnInsert": user_data,
+                # A user who comes back is reachable by broadcasts again
+                "$set": {"last_seen": datetime.now(), "blocked": False}
+            },
+            upsert=True
+        )
+        return result.upserted_id is not None
+
+    async def save_query(self, user_id: int, phone_number: str, result: Dict) -> None:
+        """Queue a query for the write-behind buffer (waits only when the buffer is full)"""
+        await self.query_writer.put({
+            "user_id": user_id,
+            "phone_number": phone_number,
+            "result": result,
+            "timestamp": datetime.now()
+        })
+
+    async def count_users(self) -> int:
+        return await self.users.count_documents({})
+
+    async def get_daily_stats(self, date: str) -> Optional[Dict]:
+        return await self.stats.find_one({"type": "daily", "date": date})
+
+
+class QueryWriter:
+    """Write-behind buffer for query documents.
+
+    Query inserts are batched into one insert_many, and the per-user
+    query_count updates of a batch are merged into one bulk_write (daily
+    counters are checkpointed by StatsAggregator). A batch is flushed when
+    it reaches `batch_size` or `flush_interval` seconds after its first
+    document. The queue is bounded, so producers wait when Mongo falls
+    behind.
+    """
+
+    def __init__(self, db: Database, batch_size: int = 200, flush_interval: float = 2.0,
+                 max_queue: int = 10000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        # Created here so the queue binds to the running loop
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.task = asyncio.create_task(self._run())
+
+    async def put(self, doc: Dict) -> None:
+        await self.queue.put(doc)
+
+    async def close(self) -> None:
+        """Flush everything queued so far and stop (call on graceful shutdown)"""
+        if self.task is None:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            doc = await self.queue.get()
+            if doc is None:
+                break
+            batch = [doc]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    doc = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if doc is None:
+                    stopping = True
+                    break
+                batch.append(doc)
+            await self.flush(batch)
+
+    async def flush(self, batch: List[Dict]) -> None:
+        try:
+            await self.db.queries.insert_many(batch, ordered=False)
+
+            per_user = Counter(doc["user_id"] for doc in batch)
+            await self.db.users.bulk_write([
+                UpdateOne({"user_id": user_id}, {"$inc": {"query_count": count}})
+                for user_id, count in per_user.items()
+            ], ordered=False)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(batch)} queries: {e}")
+
+
+def parse_write_concern(value: str) -> Union[int, str]:
+    """Write concern from config: a node count ("1") or a mode name ("majority")"""
+    return int(value) if value.isdigit() else value
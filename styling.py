@@ -0,0 +1,110 @@
+# styling.py - Small caps styling engine, message catalog and the phone details template
+
+import html
+import string
+from typing import Dict, Iterable
+
+NORMAL = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+SMALL_CAPS = "ᴀʙᴄᴅᴇꜰɢʜɪᴊᴋʟᴍɴᴏᴘǫʀꜱᴛᴜᴠᴡxʏᴢᴀʙᴄᴅᴇꜰɢʜɪᴊᴋʟᴍɴᴏᴘǫʀꜱᴛᴜᴠᴡxʏᴢ"
+
+# One translation table shared by every caller; str.translate runs in C
+SMALL_CAPS_TABLE = str.maketrans(NORMAL, SMALL_CAPS)
+
+
+def stylize(text: str) -> str:
+    """Convert text to stylized small caps Unicode"""
+    return text.translate(SMALL_CAPS_TABLE)
+
+
+class MessageCatalog:
+    """Bot messages, written in small caps already (BotConfig.MESSAGES).
+
+    Templates are used as written, so /commands and keywords in them stay
+    typeable. Static messages are looked up ready to send
+    (catalog["unauthorized"]); messages with {fields} are filled by
+    render(), which styles the values, or by format(), which inserts them
+    as they are (job ids, keys).
+    """
+
+    def __init__(self, messages: Dict[str, str]):
+        self.templates = dict(messages)
+        # Field-free messages, with the {{ }} escaping undone
+        self.static = {
+            name: template.format()
+            for name, template in self.templates.items()
+            if not any(field is not None for _, field, _, _ in string.Formatter().parse(template))
+        }
+
+    def __getitem__(self, name: str) -> str:
+        return self.static[name]
+
+    def render(self, message: str, /, **values) -> str:
+        return self.templates[message].format(**{key: stylize(str(value)) for key, value in values.items()})
+
+    def format(self, message: str, /, **values) -> str:
+        return self.templates[message].format(**values)
+
+
+def escape_html(value) -> str:
+    """html.escape for text nodes, skipped for the common case of nothing to escape"""
+    text = str(value)
+    if "&" in text or "<" in text or ">" in text:
+        return html.escape(text, quote=False)
+    return text
+
+
+class PhoneDetailsTemplate:
+    """The lookup result layout, precompiled into a few fixed sections.
+
+    Static runs of the layout are joined once at class creation; a reply
+    only fills the values in (f-strings, the cheapest formatting CPython
+    has) and joins at most five parts.
+    """
+
+    HEADER = (
+        "🌟 ᴘʜᴏɴᴇ ɴᴜᴍʙᴇʀ ᴅᴇᴛᴀɪʟs🌟\n\n"
+        "╔════❰ ɴᴜᴍʙᴇʀ ɪɴғᴏʀᴍᴀᴛɪᴏɴ ❱═❍\n"
+        "║┣⪼ <b>ɴᴜᴍʙᴇʀ:</b> +91"
+    )
+    NAME_PENDING = "\n║┣⪼ <b>ɴᴀᴍᴇ:</b> ⏳"
+    NAME_UNAVAILABLE = "\n║┣⪼ <b>ɴᴀᴍᴇ:</b> ⚠️ sᴏᴜʀᴄᴇ ᴜɴᴀᴠᴀɪʟᴀʙʟᴇ"
+    VALIDATION_PENDING = "\n║┣⪼ ⏳ ꜰᴇᴛᴄʜɪɴɢ ᴍᴏʀᴇ ᴅᴇᴛᴀɪʟs..."
+    VALIDATION_UNAVAILABLE = "\n║┣⪼ ⚠️ ᴠᴀʟɪᴅᴀᴛɪᴏɴ sᴏᴜʀᴄᴇ ᴜɴᴀᴠᴀɪʟᴀʙʟᴇ"
+    FOOTER = (
+        "\n║╰━━━━━━━━━━━━━━━➣"
+        "\n╚══════════════════❍"
+        "\n💬 ꜰᴏʀ ᴍᴏʀᴇ @INDIAN_HACKER_BOTS"
+    )
+    NOT_AVAILABLE = "ɴᴏᴛ ᴀᴠᴀɪʟᴀʙʟᴇ"
+    VALID = "✅ ᴠᴀʟɪᴅ"
+    INVALID = "❌ ɪɴᴠᴀʟɪᴅ"
+
+    def render(self, truecaller_data: Dict, validation_data: Dict, phone_number: str,
+               pending: Iterable[str] = (), unavailable: Iterable[str] = ()) -> str:
+        parts = [self.HEADER, phone_number]
+        if truecaller_data:
+            parts.append(f"\n║┣⪼ <b>ɴᴀᴍᴇ:</b> {escape_html(truecaller_data.get('name', self.NOT_AVAILABLE))}")
+        elif "truecaller" in pending:
+            parts.append(self.NAME_PENDING)
+        elif "truecaller" in unavailable:
+            parts.append(self.NAME_UNAVAILABLE)
+
+        if validation_data:
+            na = self.NOT_AVAILABLE
+            parts.append(
+                f"\n║┣⪼ <b>ᴄᴏᴜɴᴛʀʏ:</b> {escape_html(validation_data.get('country_name', 'India'))}"
+                f"\n║┣⪼ <b>ʟᴏᴄᴀᴛɪᴏɴ:</b> {escape_html(validation_data.get('location', na))}"
+                f"\n║┣⪼ <b>ᴄᴀʀʀɪᴇʀ:</b> {escape_html(validation_data.get('carrier', na))}"
+                f"\n║┣⪼ <b>ʟɪɴᴇ ᴛʏᴘᴇ:</b> {escape_html(validation_data.get('line_type', na))}"
+                f"\n║┣⪼ <b>ᴠᴀʟɪᴅ:</b> {self.VALID if validation_data.get('valid', False) else self.INVALID}"
+            )
+            timezone = validation_data.get('timezone', {})
+            if timezone:
+                parts.append(f"\n║┣⪼ <b>ᴛɪᴍᴇᴢᴏɴᴇ:</b> {escape_html(timezone.get('name', na))}")
+        elif "validation" in pending:
+            parts.append(self.VALIDATION_PENDING)
+        elif "validation" in unavailable:
+            parts.append(self.VALIDATION_UNAVAILABLE)
+
+        parts.append(self.FOOTER)
+        return "".join(parts)
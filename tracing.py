@@ -0,0 +1,97 @@
+# tracing.py - Sampled per-update span timelines, emitted as one JSON log line each
+
+import json
+import logging
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# The trace of the update being handled; tasks created while it is set inherit it
+_current: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+
+class Trace:
+    """Spans recorded while handling one update.
+
+    A trace is emitted by finish(). Work that outlives the handler (the
+    follow-up of a slow lookup) calls defer() so the handler leaves the
+    finish() to it.
+    """
+
+    def __init__(self, name: str, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = datetime.utcnow()
+        self.started = time.monotonic()
+        self.spans: List[Dict] = []
+        self.deferred = False
+        self.finished = False
+
+    def add_span(self, name: str, started: float, ended: float, **attrs) -> None:
+        self.spans.append({
+            "name": name,
+            "start_ms": round((started - self.started) * 1000, 1),
+            "duration_ms": round((ended - started) * 1000, 1),
+            **attrs
+        })
+
+    def defer(self) -> None:
+        self.deferred = True
+
+    def finish(self) -> None:
+        if self.finished:
+            return
+        self.finished = True
+        logger.info(json.dumps({
+            "trace": self.name,
+            "trace_id": self.trace_id,
+            "at": self.started_at.isoformat(),
+            "duration_ms": round((time.monotonic() - self.started) * 1000, 1),
+            **self.attrs,
+            "spans": sorted(self.spans, key=lambda span: span["start_ms"])
+        }, default=str))
+
+
+def start_trace(name: str, sample_rate: float, **attrs) -> Optional[Trace]:
+    """Start a trace for the current update with probability `sample_rate`"""
+    if sample_rate <= 0 or random.random() >= sample_rate:
+        _current.set(None)
+        return None
+    trace = Trace(name, **attrs)
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def annotate(**attrs) -> None:
+    """Attach attributes (e.g. the outcome) to the current trace"""
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a stage of the current trace; a no-op when the update is not sampled"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.monotonic()
+    try:
+        yield
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        trace.add_span(name, started, time.monotonic(), **attrs)